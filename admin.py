@@ -1,10 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload
-from database import get_db
-from models import Product, Tag
-from schemas import ProductCreate, ProductResponse
-from dependencies import get_current_admin
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db, get_db, get_read_db
+from models import Order, Product
+from schemas import OrderResponse, ProductCreate, ProductResponse
+from dependencies import CurrentUser, get_current_admin
+from cache import catalog_cache
+from catalog import mark_catalog_changed, read_catalog_version, stream_catalog
+from http_cache import catalog_headers, not_modified
+from tags import attach_tags
+from search import index_product, unindex_product
+from catalog_io import FORMATS, ImportReport, detect_format, export_products, insert_batch, parse_products
+from config import IMPORT_BATCH_SIZE
+from passwords import password_pool
+from ratelimit import limiter, write_admission
+from tokens import SIGNING_KEYS, SIGNING_KID, revocations
+from typing import List, Optional
 
 
 router = APIRouter()
@@ -14,7 +26,7 @@ router = APIRouter()
 def add_product(
     product_data: ProductCreate,
     db: Session = Depends(get_db),
-    current_admin: dict = Depends(get_current_admin)
+    current_admin: CurrentUser = Depends(get_current_admin)
 ):
     # Check for duplicate product name
     existing_product = db.query(Product).filter(Product.name == product_data.name).first()
@@ -33,19 +45,12 @@ def add_product(
         category=product_data.category,
     )
 
-    # Handle tags (ensure they exist or create new ones)
-    tags = []
-    for tag_name in product_data.tags:
-        tag = db.query(Tag).filter(Tag.name == tag_name).first()
-        if not tag:
-            tag = Tag(name=tag_name)
-            db.add(tag)
-            db.commit()
-            db.refresh(tag)
-        tags.append(tag)
-    new_product.tags = tags
-
     db.add(new_product)
+    db.flush()
+    # ✅ Whole tag list resolved in one lookup plus at most one upsert
+    tag_names = attach_tags(db, new_product.id, product_data.tags)
+    index_product(db, new_product, tag_names)
+    mark_catalog_changed(db)
     db.commit()
     db.refresh(new_product)
 
@@ -54,21 +59,117 @@ def add_product(
 # ✅ Get All Products
 @router.get("/products/", response_model=List[ProductResponse])
 def get_products(
-    db: Session = Depends(get_db),
-    current_admin: dict = Depends(get_current_admin)
+    request: Request,
+    db: Session = Depends(get_read_db),
+    current_admin: CurrentUser = Depends(get_current_admin)
+):
+    # ✅ Revalidated on every request, answered with 304 until the catalog changes
+    catalog = read_catalog_version(db)
+    headers = catalog_headers(catalog, private=True)
+    response = not_modified(request.headers, headers)
+    if response is not None:
+        return response
+
+    # ✅ Streamed from a server-side cursor in batches; memory no longer grows with the catalog
+    return StreamingResponse(stream_catalog(), media_type="application/json", headers=headers)
+
+# ✅ Bulk Import (NDJSON or CSV, streamed and inserted in batches)
+@router.post("/products/import")
+async def import_products(
+    request: Request,
+    format: Optional[str] = Query(None, regex="^(ndjson|csv)$"),
+    db: AsyncSession = Depends(get_async_db),
+    current_admin: CurrentUser = Depends(get_current_admin)
+):
+    fmt = format or detect_format(request.headers.get("content-type"))
+    if fmt is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send application/x-ndjson or text/csv, or pass ?format="
+        )
+
+    report = ImportReport()
+    batch = []
+    try:
+        async for row in parse_products(request.stream(), fmt, report):
+            batch.append(row)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await db.run_sync(insert_batch, batch, report)
+                batch = []
+        if batch:
+            await db.run_sync(insert_batch, batch, report)
+    except UnicodeDecodeError:
+        # Earlier batches stay committed
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Import body must be UTF-8")
+
+    return report
+
+# ✅ Bulk Export (streamed, never holds the whole catalog in memory)
+@router.get("/products/export")
+def export_catalog(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$"),
+    current_admin: CurrentUser = Depends(get_current_admin)
 ):
-    products = db.query(Product).all()
-    return products
+    return StreamingResponse(
+        export_products(format),
+        media_type=FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="products.{format}"'},
+    )
 
 # ✅ Delete Product
 @router.delete("/delete-product/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_product(product_id: int, db: Session = Depends(get_db), current_admin: dict = Depends(get_current_admin)):
+def delete_product(product_id: int, db: Session = Depends(get_db), current_admin: CurrentUser = Depends(get_current_admin)):
     product = db.query(Product).filter(Product.id == product_id).first()
     
     if not product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
 
     db.delete(product)
+    unindex_product(db, product_id)
+    mark_catalog_changed(db)
     db.commit()
-    
+
     return {"message": "Product deleted successfully"}
+
+# ✅ List Orders (newest first, keyset-paginated by id)
+@router.get("/orders/", response_model=List[OrderResponse])
+def list_orders(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[int] = None,
+    user_id: Optional[int] = None,
+    db: Session = Depends(get_read_db),
+    current_admin: CurrentUser = Depends(get_current_admin)
+):
+    query = db.query(Order).options(selectinload(Order.items))
+    if user_id is not None:
+        query = query.filter(Order.user_id == user_id)
+    if cursor is not None:
+        query = query.filter(Order.id < cursor)
+
+    orders = query.order_by(Order.id.desc()).limit(limit + 1).all()
+    if len(orders) > limit:
+        orders = orders[:limit]
+        response.headers["X-Next-Cursor"] = str(orders[-1].id)
+
+    return orders
+
+# ✅ Catalog Cache Statistics
+@router.get("/cache-stats")
+def cache_stats(current_admin: CurrentUser = Depends(get_current_admin)):
+    return catalog_cache.stats()
+
+# ✅ Password Pool Statistics (queue depth, rejections)
+@router.get("/password-stats")
+def password_stats(current_admin: CurrentUser = Depends(get_current_admin)):
+    return password_pool.stats()
+
+# ✅ Rate Limit and Write Admission Statistics
+@router.get("/admission-stats")
+def admission_stats(current_admin: CurrentUser = Depends(get_current_admin)):
+    return {"rate_limits": limiter.stats(), "writes": write_admission.stats()}
+
+# ✅ Token Keys and Revocation List Statistics
+@router.get("/token-stats")
+def token_stats(current_admin: CurrentUser = Depends(get_current_admin)):
+    return {"signing_kid": SIGNING_KID, "kids": list(SIGNING_KEYS), "revocations": revocations.stats()}
@@ -1,37 +1,33 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
-from datetime import datetime, timedelta
-from jwt import encode
-
-from database import get_db
-from models import User, Product, Tag
-from schemas import UserCreate, UserResponse, LoginRequest, Token, ProductCreate, ProductResponse
-from config import SECRET_KEY, ALGORITHM
-from dependencies import get_current_user, get_current_admin
+from sqlalchemy.ext.asyncio import AsyncSession
+from jwt import InvalidTokenError
+
+from database import get_async_db, get_db
+from models import User, Product
+from schemas import UserCreate, UserResponse, LoginRequest, Token, RefreshRequest, LogoutRequest, ProductCreate, ProductResponse
+from dependencies import CurrentUser, oauth2_scheme, get_current_user, get_current_admin, get_current_db_user, invalidate_user
+from inventory import release_holds
+from tokens import ACCESS, REFRESH, decode_token, issue_tokens, revoke_token, revoke_user_tokens
+from catalog import mark_catalog_changed
+from tags import attach_tags
+from search import index_product
+from passwords import password_pool
+from ratelimit import LOGIN_PER_ACCOUNT, LOGIN_PER_IP, SIGNUP_PER_IP, limit_by_ip, limiter
 
 router = APIRouter(tags=["Authentication"])
 
-# Password hashing setup
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-# Token expiration time (30 minutes)
-ACCESS_TOKEN_EXPIRE_MINUTES = 3000
-
-def create_access_token(data: dict, expires_delta: timedelta | None = None):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
-    return encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-
 # ------------------- SIGNUP -------------------
-@router.post("/signup", response_model=UserResponse)
-def signup(user_data: UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+@router.post("/signup", response_model=UserResponse, dependencies=[Depends(limit_by_ip(SIGNUP_PER_IP))])
+async def signup(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    existing_user = (await db.execute(select(User.id).where(User.email == user_data.email))).first()
     if existing_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
 
-    hashed_password = pwd_context.hash(user_data.password)
+    # bcrypt runs in the password pool, not on this worker
+    hashed_password = await password_pool.hash(user_data.password)
 
     new_user = User(
         email=user_data.email,
@@ -42,31 +38,93 @@ def signup(user_data: UserCreate, db: Session = Depends(get_db)):
     )
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    
+    await db.commit()
+
     return new_user
 
 # ------------------- LOGIN -------------------
-@router.post("/login", response_model=Token)
-def login(login_data: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == login_data.email).first()
-    
-    if not user or not pwd_context.verify(login_data.password, user.password):
+@router.post("/login", response_model=Token, dependencies=[Depends(limit_by_ip(LOGIN_PER_IP))])
+async def login(login_data: LoginRequest, db: AsyncSession = Depends(get_async_db)):
+    # ✅ Guessing one account's password is throttled however many addresses it comes from
+    await limiter.check(LOGIN_PER_ACCOUNT, login_data.email.lower())
+
+    user = (await db.execute(select(User).where(User.email == login_data.email))).scalars().first()
+    if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email or password")
 
-    access_token = create_access_token(data={"sub": user.email})
-    
-    return {"access_token": access_token, "token_type": "bearer"}
+    valid, new_hash = await password_pool.verify(login_data.password, user.password)
+    if not valid:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email or password")
+
+    # ✅ Upgrade hashes made with an older work factor while we have the plaintext
+    if new_hash:
+        user.password = new_hash
+        await db.commit()
+
+    # ✅ Id and role travel in the access token, so authenticated requests need no user lookup
+    return issue_tokens(user.id, user.email, user.is_admin)
+
+# ------------------- REFRESH -------------------
+@router.post("/refresh", response_model=Token)
+def refresh(refresh_data: RefreshRequest, db: Session = Depends(get_db)):
+    try:
+        claims = decode_token(refresh_data.refresh_token, REFRESH)
+    except InvalidTokenError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired refresh token")
+
+    # Role changes and deleted accounts are picked up here, at most one access token lifetime late
+    user = db.execute(select(User.id, User.email, User.is_admin).where(User.id == claims["uid"])).first()
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired refresh token")
+
+    # ✅ Refresh tokens are single-use: the one presented is revoked as its replacement is issued
+    try:
+        revoke_token(db, claims)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token has already been used")
+
+    return issue_tokens(user.id, user.email, user.is_admin)
+
+# ------------------- LOGOUT -------------------
+@router.post("/logout")
+def logout(logout_data: LogoutRequest | None = None, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    try:
+        presented = [decode_token(token, ACCESS)]
+        if logout_data is not None and logout_data.refresh_token:
+            presented.append(decode_token(logout_data.refresh_token, REFRESH))
+    except InvalidTokenError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+    if "jti" not in presented[0]:
+        # From before key ids: no jti to revoke it by, so every token the user holds goes (see RevocationList.is_user_revoked)
+        user_id = db.scalar(select(User.id).where(User.email == presented[0].get("sub")))
+        if user_id is not None:
+            revoke_user_tokens(db, user_id)
+            db.commit()
+            invalidate_user(user_id)
+        return {"message": "Logged out"}
+
+    for claims in presented:
+        if claims["uid"] != presented[0]["uid"]:
+            continue  # someone else's refresh token is not ours to revoke
+        try:
+            revoke_token(db, claims)
+            db.commit()
+        except IntegrityError:
+            db.rollback()  # already revoked
+
+    return {"message": "Logged out"}
 
 # ------------------- ADMIN ACCOUNT CREATION -------------------
 @router.post("/create-admin", response_model=UserResponse)
-def create_admin(user_data: UserCreate, current_admin: User = Depends(get_current_admin), db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+async def create_admin(user_data: UserCreate, current_admin: CurrentUser = Depends(get_current_admin), db: AsyncSession = Depends(get_async_db)):
+    existing_user = (await db.execute(select(User.id).where(User.email == user_data.email))).first()
     if existing_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
 
-    hashed_password = pwd_context.hash(user_data.password)
+    hashed_password = await password_pool.hash(user_data.password)
 
     new_admin = User(
         email=user_data.email,
@@ -78,15 +136,14 @@ def create_admin(user_data: UserCreate, current_admin: User = Depends(get_curren
     )
 
     db.add(new_admin)
-    db.commit()
-    db.refresh(new_admin)
+    await db.commit()
 
     return new_admin
 
 # ------------------- DELETE ACCOUNT -------------------
 @router.delete("/delete-account")
-def delete_account(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == current_user.email).first()
+def delete_account(current_user: CurrentUser = Depends(get_current_user), db: Session = Depends(get_db)):
+    user = db.get(User, current_user.id)
     
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
@@ -94,19 +151,23 @@ def delete_account(current_user: User = Depends(get_current_user), db: Session =
     if user.is_admin:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admins cannot delete themselves")
 
+    release_holds(db, user.id)  # held units go back on sale now, not when the holds would expire
     db.delete(user)
+    # ✅ Every token issued so far stops working here on commit, and in other workers within a sync interval
+    revoke_user_tokens(db, current_user.id)
     db.commit()
-    
+    invalidate_user(current_user.id)
+
     return {"message": "Account deleted successfully"}
 
 # ------------------- PROTECTED ROUTE -------------------
 @router.get("/me", response_model=UserResponse)
-def get_current_user_info(current_user: User = Depends(get_current_user)):
+def get_current_user_info(current_user: User = Depends(get_current_db_user)):
     return current_user
 
 # ------------------- ADD PRODUCT (ADMIN ONLY) -------------------
 @router.post("/admin/add-product", response_model=ProductResponse)
-def add_product(product_data: ProductCreate, current_admin: User = Depends(get_current_admin), db: Session = Depends(get_db)):
+def add_product(product_data: ProductCreate, current_admin: CurrentUser = Depends(get_current_admin), db: Session = Depends(get_db)):
     # Create product instance
     new_product = Product(
         name=product_data.name,
@@ -116,18 +177,12 @@ def add_product(product_data: ProductCreate, current_admin: User = Depends(get_c
         category=product_data.category
     )
 
-    # Process tags
-    tag_objects = []
-    for tag_name in product_data.tags:
-        tag = db.query(Tag).filter(Tag.name == tag_name).first()
-        if not tag:
-            tag = Tag(name=tag_name)
-            db.add(tag)
-        tag_objects.append(tag)
-
-    new_product.tags = tag_objects
-
     db.add(new_product)
+    db.flush()
+    # ✅ Whole tag list resolved in one lookup plus at most one upsert
+    tag_names = attach_tags(db, new_product.id, product_data.tags)
+    index_product(db, new_product, tag_names)
+    mark_catalog_changed(db)
     db.commit()
     db.refresh(new_product)
 
@@ -0,0 +1,107 @@
+"""Event-loop responsiveness under slow catalog queries: blocking vs. AsyncSession handlers.
+
+Run from the project root:  python -m benchmarks.async_catalog
+
+Seeds a throwaway SQLite database, then drives the ASGI app in-process
+with many concurrent listing requests. The "blocking" route is the old
+pattern (an ``async def`` handler doing sync SQLAlchemy I/O on the loop);
+the "async" route is the real GET /products. While the listings run, a
+probe keeps calling GET / and records its latency - with a blocked loop
+the probe waits behind every query.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def drive(client, path, params, concurrency, requests):
+    listing_latencies, probe_latencies = [], []
+    remaining = requests
+    done = asyncio.Event()
+
+    async def lister():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await client.get(path, params=params)
+            response.raise_for_status()
+            listing_latencies.append(time.perf_counter() - started)
+
+    async def probe():
+        while not done.is_set():
+            started = time.perf_counter()
+            await client.get("/")
+            probe_latencies.append(time.perf_counter() - started)
+            await asyncio.sleep(0.005)
+
+    probe_task = asyncio.create_task(probe())
+    started = time.perf_counter()
+    await asyncio.gather(*(lister() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await probe_task
+    return elapsed, listing_latencies, probe_latencies
+
+
+async def main_async(args):
+    import httpx
+    import main
+    from catalog import build_listing_query, build_page
+    from database import ReadSessionLocal, SessionLocal
+    from migrations import run_migrations
+    from models import Product
+
+    run_migrations()
+    with SessionLocal() as db:
+        db.add_all([
+            Product(name=f"bench-{i}", description="d" * 300, price=i % 997, stock=i % 5, category=f"c{i % 10}")
+            for i in range(args.products)
+        ])
+        db.commit()
+
+    # The pre-port handler shape: async def + blocking Session calls on the event loop
+    # (the session is opened inline: a threadpool-closed dependency could deadlock the blocked loop)
+    @main.app.get("/bench/blocking-products")
+    async def blocking_products(sort: str = "price_desc", limit: int = 200):
+        with ReadSessionLocal() as db:
+            rows = db.execute(build_listing_query(sort=sort, limit=limit, in_stock=True)).all()
+            return build_page(db, rows)
+
+    params = {"sort": "price_desc", "limit": 200, "in_stock": "true"}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for label, path in (("blocking", "/bench/blocking-products"), ("async", "/products")):
+            elapsed, listings, probes = await drive(client, path, params, args.concurrency, args.requests)
+            print(
+                f"{label:>8}: {len(listings) / elapsed:7.1f} listings/s | "
+                f"listing p50 {statistics.median(listings) * 1000:7.1f} ms | "
+                f"probe p50 {statistics.median(probes) * 1000:6.1f} ms "
+                f"p95 {percentile(probes, 0.95) * 1000:6.1f} ms ({len(probes)} probes)"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=400)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Must be set before the app modules are imported; disable the page cache so every request queries
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        os.environ["CATALOG_CACHE_TTL_SECONDS"] = "0"
+        asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
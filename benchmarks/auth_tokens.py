@@ -0,0 +1,78 @@
+"""Cost of authenticating a request: email-only tokens (user lookup) vs tokens carrying id and role.
+
+Run from the project root:  python -m benchmarks.auth_tokens
+
+Calls dependencies.get_current_user directly against a throwaway database
+and counts the SQL statements it runs. "email-only, uncached" is what every
+request paid once the user cache missed (and what each worker pays per
+token); "email-only, cached" is a user cache hit; "claims" is the current
+access token: verified by signature and expiry on first use (~100us in
+PyJWT), then served from the verified-claims cache, with the in-memory
+revocation list checked on every call. Its only query is the revocation
+sync, once per TOKEN_REVOCATION_SYNC_SECONDS per worker, on the read engine.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'auth.db')}"  # before anything imports config
+        os.environ["SAVED_ITEM_SCAN_INTERVAL_SECONDS"] = "0"
+        from sqlalchemy import event, insert, select
+        from jwt import encode
+
+        from config import ALGORITHM, SECRET_KEY
+        from database import ReadSessionLocal, SessionLocal, read_engine
+        from dependencies import get_current_user, user_cache
+        from migrations import run_migrations
+        from models import User
+        from tokens import issue_tokens, revocations
+
+        run_migrations()
+        with SessionLocal() as db:
+            db.execute(insert(User), [
+                {"email": f"user{i}@bench.example.com", "password": "x", "first_name": "Bench", "last_name": str(i), "phone_number": f"555{i:07d}"}
+                for i in range(args.users)
+            ])
+            db.commit()
+            users = db.execute(select(User.id, User.email, User.is_admin)).all()
+
+        legacy = [encode({"sub": user.email, "exp": int(time.time()) + 3600}, SECRET_KEY, algorithm=ALGORITHM) for user in users]
+        current = [issue_tokens(user.id, user.email, bool(user.is_admin))["access_token"] for user in users]
+        revocations.sync()
+
+        statements = 0
+
+        def count(*_):
+            nonlocal statements
+            statements += 1
+
+        event.listen(read_engine, "before_cursor_execute", count)
+
+        def run(label, tokens, clear_cache):
+            nonlocal statements
+            statements = 0
+            started = time.perf_counter()
+            for i in range(args.calls):
+                if clear_cache:
+                    user_cache.clear()
+                with ReadSessionLocal() as db:
+                    get_current_user(tokens[i % len(tokens)], db)
+            elapsed = time.perf_counter() - started
+            print(f"{label:>22}: {elapsed / args.calls * 1e6:7.1f} us/request  {statements / args.calls:.2f} queries/request")
+
+        run("email-only, uncached", legacy, clear_cache=True)
+        run("email-only, cached", legacy, clear_cache=False)
+        run("claims", current, clear_cache=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Checkout stress test: many threads racing for the same product.
+
+Run from the project root:  python -m benchmarks.checkout_concurrency
+
+Exits non-zero if stock is oversold or goes negative, then prints checkout
+latency for growing cart sizes (it should stay roughly flat per item count,
+since the cart is read in one query).
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+
+from checkout import place_order
+from database import create_db_engine
+from models import Base, Cart, OrderItem, Product, User
+
+
+def make_session_factory(path):
+    engine = create_db_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def seed_users(db, count, prefix):
+    users = [
+        User(email=f"{prefix}{i}@bench.local", password="x", first_name="B", last_name="U", phone_number=f"{prefix}{i}")
+        for i in range(count)
+    ]
+    db.add_all(users)
+    db.commit()
+    return [user.id for user in users]
+
+
+def race(SessionLocal, threads, stock, quantity):
+    with SessionLocal() as db:
+        product = Product(name="contended", description="d", price=10.0, stock=stock, category="bench")
+        db.add(product)
+        db.commit()
+        product_id = product.id
+        user_ids = seed_users(db, threads, "race")
+        db.add_all([Cart(user_id=user_id, product_id=product_id, quantity=quantity) for user_id in user_ids])
+        db.commit()
+
+    outcomes = {"ok": 0, "rejected": 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker(user_id):
+        barrier.wait()
+        with SessionLocal() as db:
+            try:
+                place_order(db, user_id)
+                key = "ok"
+            except HTTPException:
+                key = "rejected"
+        with lock:
+            outcomes[key] += 1
+
+    workers = [threading.Thread(target=worker, args=(user_id,)) for user_id in user_ids]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    with SessionLocal() as db:
+        remaining = db.get(Product, product_id).stock
+        sold = db.scalar(select(func.coalesce(func.sum(OrderItem.quantity), 0)).where(OrderItem.product_id == product_id))
+
+    print(f"threads={threads} stock={stock} qty/checkout={quantity} -> {outcomes}, sold={sold}, remaining={remaining}")
+    assert remaining >= 0, "stock went negative"
+    assert sold + remaining == stock, "sold + remaining does not match initial stock"
+    assert outcomes["ok"] == sold // quantity == min(threads, stock // quantity), "oversold or undersold"
+
+
+def latency_by_cart_size(SessionLocal, sizes, repeats):
+    with SessionLocal() as db:
+        products = [Product(name=f"item-{i}", description="d", price=1.0, stock=10**9, category="bench") for i in range(max(sizes))]
+        db.add_all(products)
+        db.commit()
+        product_ids = [product.id for product in products]
+        user_ids = seed_users(db, len(sizes) * repeats, "lat")
+
+    users = iter(user_ids)
+    for size in sizes:
+        samples = []
+        for _ in range(repeats):
+            user_id = next(users)
+            with SessionLocal() as db:
+                db.add_all([Cart(user_id=user_id, product_id=product_id, quantity=1) for product_id in product_ids[:size]])
+                db.commit()
+                started = time.perf_counter()
+                place_order(db, user_id)
+                samples.append((time.perf_counter() - started) * 1000)
+        median = statistics.median(samples)
+        print(f"cart size {size:>4}: median {median:7.2f} ms, {median / size:6.3f} ms/item")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=50)
+    parser.add_argument("--stock", type=int, default=20)
+    parser.add_argument("--quantity", type=int, default=1)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 50, 200])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        SessionLocal = make_session_factory(os.path.join(tmp, "bench.db"))
+        race(SessionLocal, args.threads, args.stock, args.quantity)
+        latency_by_cart_size(SessionLocal, args.sizes, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Concurrent reader/writer throughput: legacy engine settings vs. database.create_db_engine.
+
+Run from the project root:  python -m benchmarks.db_concurrency
+
+Each configuration gets a fresh SQLite file seeded with products. Reader
+threads run a catalog listing query while writer threads commit stock
+updates; the script reports operations per second and "database is
+locked" failures for each setup.
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database import create_db_engine
+from models import Base, Product
+
+
+def legacy_engines(url):
+    # What database.py did before: default pool, rollback journal, no busy handling
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    return engine, engine
+
+
+def tuned_engines(url):
+    return create_db_engine(url), create_db_engine(url, read_only=True)
+
+
+def seed(engine, products):
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as db:
+        db.add_all([
+            Product(name=f"p{i}", description="d" * 200, price=i % 500, stock=10**6, category=f"c{i % 20}")
+            for i in range(products)
+        ])
+        db.commit()
+
+
+def run(name, make_engines, args, workdir):
+    url = f"sqlite:///{os.path.join(workdir, name + '.db')}"
+    write_engine, read_engine = make_engines(url)
+    seed(write_engine, args.products)
+    Writer = sessionmaker(bind=write_engine)
+    Reader = sessionmaker(bind=read_engine)
+
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+    stop = time.perf_counter() + args.seconds
+
+    def bump(key):
+        with lock:
+            counts[key] += 1
+
+    def reader():
+        while time.perf_counter() < stop:
+            try:
+                with Reader() as db:
+                    db.execute(
+                        select(Product).where(Product.category == f"c{random.randrange(20)}").order_by(Product.price).limit(50)
+                    ).all()
+                bump("reads")
+            except OperationalError:
+                bump("errors")
+
+    def writer():
+        while time.perf_counter() < stop:
+            try:
+                with Writer() as db:
+                    db.execute(update(Product).where(Product.id == random.randint(1, args.products)).values(stock=Product.stock - 1))
+                    db.commit()
+                bump("writes")
+            except OperationalError:
+                bump("errors")
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    threads += [threading.Thread(target=writer) for _ in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    write_engine.dispose()
+    read_engine.dispose()
+
+    print(
+        f"{name:>7}: {counts['reads'] / args.seconds:9.1f} reads/s  "
+        f"{counts['writes'] / args.seconds:8.1f} writes/s  {counts['errors']} lock errors"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        run("legacy", legacy_engines, args, workdir)
+        run("tuned", tuned_engines, args, workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Bytes on the wire and server peak RSS for large catalog responses.
+
+Run from the project root:  python -m benchmarks.large_listing --products 50000
+
+Seeds a throwaway database, then for each scenario starts a fresh uvicorn
+server and fetches one response while reading raw (still encoded) bytes.
+The server's peak RSS (VmHWM) is read before and after, so the growth is
+what that one response cost. "buffered" is the old admin listing (whole
+catalog built, encoded and sent as one blob); "streamed" is the current
+GET /admin/products/. A /products page is included to show what
+compression alone does for a normal listing.
+
+SQLite's mmap is turned off (unless SQLITE_MMAP_SIZE is set) because
+mapped database pages count towards RSS and would hide the heap growth.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+SERVER = """
+import sys
+import uvicorn
+from fastapi import Depends, Response
+from sqlalchemy import select
+import main
+from catalog import PRODUCT_COLUMNS, build_page
+from database import get_read_db
+from models import Product
+from responses import dumps
+
+@main.app.get("/bench/buffered-catalog")
+def buffered_catalog(db=Depends(get_read_db)):
+    rows = db.execute(select(*PRODUCT_COLUMNS).order_by(Product.id)).all()
+    return Response(content=dumps(build_page(db, rows)), media_type="application/json")
+
+uvicorn.run(main.app, port=int(sys.argv[1]), log_level="warning")
+"""
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def peak_rss_kb(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    return 0
+
+
+def measure(env, path, encoding, token=None):
+    import httpx
+
+    port = _free_port()
+    server = subprocess.Popen([sys.executable, "-c", SERVER, str(port)], env=env)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=300) as client:
+            for _ in range(300):
+                if server.poll() is not None:
+                    raise RuntimeError(f"server exited with code {server.returncode}")
+                try:
+                    if client.get("/products", params={"limit": 10}).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.1)
+            else:
+                raise RuntimeError("server did not start")
+
+            headers = {"Accept-Encoding": encoding}
+            if token:
+                headers["Authorization"] = f"Bearer {token}"
+            before = peak_rss_kb(server.pid)
+            started = time.perf_counter()
+            wire_bytes = 0
+            with client.stream("GET", path, headers=headers) as response:
+                response.raise_for_status()
+                for chunk in response.iter_raw():
+                    wire_bytes += len(chunk)
+            elapsed = time.perf_counter() - started
+            return wire_bytes, peak_rss_kb(server.pid) - before, elapsed
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def login():
+    from starlette.testclient import TestClient
+
+    import main
+    from benchmarks.seed import ADMIN_EMAIL, SEED_PASSWORD
+
+    with TestClient(main.app) as client:
+        return client.post("/auth/login", json={"email": ADMIN_EMAIL, "password": SEED_PASSWORD}).json()["access_token"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=50000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "listing.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"  # before anything imports config
+        os.environ["SAVED_ITEM_SCAN_INTERVAL_SECONDS"] = "0"
+        os.environ.setdefault("SQLITE_MMAP_SIZE", "0")
+        from benchmarks.seed import seed
+        from compression import ENCODERS
+        seed(os.environ["DATABASE_URL"], users=1, products=args.products, tags=200, carts=0)
+        env = {**os.environ, "PYTHONPATH": os.getcwd()}
+        token = login()
+
+        encodings = ["identity", *ENCODERS]
+        scenarios = [("buffered", "/bench/buffered-catalog", "identity", None)]
+        scenarios += [("streamed", "/admin/products/", encoding, token) for encoding in encodings]
+        scenarios += [("page of 200", "/products?limit=200", encoding, None) for encoding in encodings]
+
+        print(f"{'scenario':>12} {'encoding':>9} {'wire KiB':>10} {'peak RSS +MiB':>14} {'seconds':>8}")
+        for label, url, encoding, auth in scenarios:
+            wire_bytes, rss_kb, elapsed = measure(env, url, encoding, auth)
+            print(f"{label:>12} {encoding:>9} {wire_bytes / 1024:10.1f} {rss_kb / 1024:14.1f} {elapsed:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+"""Mixed-workload load test for the whole API, with JSON baselines for regression diffs.
+
+Run from the project root:
+
+    python -m benchmarks.load                                  # mixed workload, in-process ASGI
+    python -m benchmarks.load --mode uvicorn --workers 4       # against a local uvicorn
+    python -m benchmarks.load --workload checkout --save base.json
+    python -m benchmarks.load --workload checkout --compare base.json
+
+Seeds a throwaway database (see benchmarks.seed) unless --db points at an
+existing seeded file, logs in one session per virtual user, then runs the
+chosen workload for --duration seconds. Every request is timed under a
+step label; the report gives count, errors, req/s and p50/p95/p99 per step
+and overall. --compare exits non-zero when a step's p95 or throughput is
+worse than the baseline by more than --tolerance percent.
+
+Workloads:
+  browse    listing pages (random sort/category, one cursor hop), search, tag facets
+  cart      add to cart, view cart, remove
+  checkout  add two items, check out
+  login     password login (bcrypt bound)
+  admin     create a product, delete it again
+  mixed     browse 60%, cart 20%, checkout 10%, login 5%, admin 5%
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+from benchmarks.seed import ADJECTIVES, ADMIN_EMAIL, CATEGORIES, NOUNS, SEED_PASSWORD, add_arguments, seed, user_email
+
+WORKLOADS = {
+    "browse": {"browse": 1},
+    "cart": {"cart": 1},
+    "checkout": {"checkout": 1},
+    "login": {"login": 1},
+    "admin": {"admin": 1},
+    "mixed": {"browse": 60, "cart": 20, "checkout": 10, "login": 5, "admin": 5},
+}
+SORTS = ("id", "newest", "price_asc", "price_desc", "name")
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+# ---------------- RECORDING ----------------
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = Counter()
+        self.statuses = defaultdict(Counter)
+
+    async def request(self, client, label, method, url, expect=(200,), **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except Exception:
+            self.samples[label].append(time.perf_counter() - started)
+            self.errors[label] += 1
+            self.statuses[label]["exception"] += 1
+            return None
+        self.samples[label].append(time.perf_counter() - started)
+        self.statuses[label][response.status_code] += 1
+        if response.status_code not in expect:
+            self.errors[label] += 1
+        return response
+
+    def summary(self, elapsed: float) -> dict:
+        results = {}
+        everything = []
+        for label in sorted(self.samples):
+            samples = self.samples[label]
+            everything.extend(samples)
+            results[label] = _stats(samples, self.errors[label], elapsed)
+            results[label]["statuses"] = {str(code): count for code, count in self.statuses[label].items()}
+        if everything:
+            results["TOTAL"] = _stats(everything, sum(self.errors.values()), elapsed)
+        return results
+
+
+def _stats(samples, errors, elapsed):
+    return {
+        "count": len(samples),
+        "errors": errors,
+        "rps": len(samples) / elapsed,
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p95_ms": percentile(samples, 0.95) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+    }
+
+
+# ---------------- SCENARIOS ----------------
+async def browse(client, recorder, rng, session):
+    params = {"sort": rng.choice(SORTS), "limit": 50}
+    if rng.random() < 0.5:
+        params["category"] = rng.choice(CATEGORIES)
+    response = await recorder.request(client, "browse: list", "GET", "/products", params=params)
+    cursor = response.headers.get("x-next-cursor") if response is not None else None
+    if cursor:
+        await recorder.request(client, "browse: next page", "GET", "/products", params={**params, "cursor": cursor})
+    query = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)[:rng.randint(3, 6)]}"
+    await recorder.request(client, "browse: search", "GET", "/products/search", params={"q": query})
+    if rng.random() < 0.2:
+        await recorder.request(client, "browse: tag facets", "GET", "/products/tags")
+
+
+async def cart(client, recorder, rng, session):
+    product_id = rng.choice(session["product_ids"])
+    await recorder.request(
+        client, "cart: add", "POST", "/cart/add", json={"product_id": product_id, "quantity": 1}, headers=session["headers"]
+    )
+    await recorder.request(client, "cart: view", "GET", "/cart/", headers=session["headers"])
+    await recorder.request(client, "cart: remove", "DELETE", f"/cart/remove/{product_id}", headers=session["headers"])
+
+
+async def checkout(client, recorder, rng, session):
+    for product_id in rng.sample(session["product_ids"], 2):
+        await recorder.request(
+            client, "checkout: add", "POST", "/cart/add", json={"product_id": product_id, "quantity": 1}, headers=session["headers"]
+        )
+    await recorder.request(client, "checkout: place order", "POST", "/cart/checkout", headers=session["headers"])
+
+
+async def login(client, recorder, rng, session):
+    await recorder.request(client, "login", "POST", "/auth/login", json={"email": session["email"], "password": SEED_PASSWORD})
+
+
+async def admin(client, recorder, rng, session):
+    product = {
+        "name": f"bench {rng.getrandbits(64):x}",
+        "description": "created by the load test",
+        "price": 9.99,
+        "stock": 100,
+        "category": rng.choice(CATEGORIES),
+        "tags": [f"tag-{rng.randrange(50)}", "load-test"],
+    }
+    response = await recorder.request(client, "admin: add product", "POST", "/admin/add-product", json=product, headers=session["admin_headers"])
+    if response is not None and response.status_code == 200:
+        await recorder.request(
+            client, "admin: delete product", "DELETE", f"/admin/delete-product/{response.json()['id']}",
+            expect=(200, 204), headers=session["admin_headers"],
+        )
+
+
+SCENARIOS = {"browse": browse, "cart": cart, "checkout": checkout, "login": login, "admin": admin}
+
+
+# ---------------- DRIVER ----------------
+async def _token(client, email):
+    response = await client.post("/auth/login", json={"email": email, "password": SEED_PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run_workload(client, args, product_ids):
+    rng = random.Random(args.seed)
+    admin_headers = await _token(client, ADMIN_EMAIL)
+    emails = [user_email(i) for i in rng.sample(range(args.users), min(args.concurrency, args.users))]
+    sessions = [
+        {"email": email, "headers": headers, "admin_headers": admin_headers, "product_ids": product_ids}
+        for email, headers in zip(emails, await asyncio.gather(*(_token(client, email) for email in emails)))
+    ]
+
+    weights = WORKLOADS[args.workload]
+    names, shares = list(weights), list(weights.values())
+    recorder = Recorder()
+    deadline = time.perf_counter() + args.duration
+
+    async def virtual_user(index):
+        user_rng = random.Random(args.seed * 1000 + index)
+        session = sessions[index % len(sessions)]
+        while time.perf_counter() < deadline:
+            scenario = user_rng.choices(names, shares)[0]
+            await SCENARIOS[scenario](client, recorder, user_rng, session)
+
+    if args.warmup:
+        warm = Recorder()
+        await asyncio.gather(*(browse(client, warm, random.Random(i), sessions[0]) for i in range(args.warmup)))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(virtual_user(index) for index in range(args.concurrency)))
+    return recorder.summary(time.perf_counter() - started)
+
+
+async def run_asgi(args, product_ids):
+    import httpx
+    import main
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=60) as client:
+        try:
+            return await run_workload(client, args, product_ids)
+        finally:
+            from passwords import password_pool
+            password_pool.shutdown()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_uvicorn(args, product_ids):
+    import httpx
+
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(args.workers), "--log-level", "warning"],
+        env={**os.environ, "DATABASE_URL": os.environ["DATABASE_URL"]},
+    )
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+            for _ in range(300):
+                if server.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with code {server.returncode}")
+                try:
+                    if (await client.get("/")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("uvicorn did not start")
+            return await run_workload(client, args, product_ids)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+# ---------------- REPORTING ----------------
+def print_report(results):
+    print(f"{'step':>24} {'count':>7} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for label, row in results.items():
+        print(
+            f"{label:>24} {row['count']:7d} {row['errors']:6d} {row['rps']:8.1f} "
+            f"{row['p50_ms']:8.2f} {row['p95_ms']:8.2f} {row['p99_ms']:8.2f}"
+        )
+
+
+def compare(results, baseline, tolerance):
+    """Prints per-step deltas against a saved baseline; returns the steps that regressed."""
+    regressions = []
+    print(f"\n{'step':>24} {'p95 ms':>18} {'change':>8} {'req/s':>18} {'change':>8}")
+    for label, row in results.items():
+        before = baseline["results"].get(label)
+        if before is None:
+            continue
+        p95_change = (row["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 if before["p95_ms"] else 0.0
+        rps_change = (row["rps"] - before["rps"]) / before["rps"] * 100 if before["rps"] else 0.0
+        regressed = p95_change > tolerance or rps_change < -tolerance
+        if regressed:
+            regressions.append(label)
+        print(
+            f"{label:>24} {before['p95_ms']:8.2f} -> {row['p95_ms']:6.2f} {p95_change:+7.1f}% "
+            f"{before['rps']:8.1f} -> {row['rps']:6.1f} {rps_change:+7.1f}%{'  REGRESSED' if regressed else ''}"
+        )
+    return regressions
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workload", choices=sorted(WORKLOADS), default="mixed")
+    parser.add_argument("--mode", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes (--mode uvicorn)")
+    parser.add_argument("--concurrency", type=int, default=16, help="virtual users")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of measured load")
+    parser.add_argument("--warmup", type=int, default=8, help="unmeasured browse passes before the run")
+    parser.add_argument("--db", help="existing database seeded by benchmarks.seed (default: seed a fresh one)")
+    parser.add_argument("--save", help="write the results to this JSON baseline")
+    parser.add_argument("--compare", help="diff against this JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="allowed p95/req/s regression in percent")
+    parser.add_argument("--rate-limits", action="store_true", help="keep per-route rate limits on (every virtual user shares one IP)")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.db or os.path.join(directory, "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"  # before anything imports config
+        if not args.rate_limits:
+            os.environ["RATE_LIMITS_ENABLED"] = "false"
+        if not args.db:
+            started = time.perf_counter()
+            counts = seed(f"sqlite:///{path}", args.users, args.products, args.tags, args.carts, seed_value=args.seed)
+            print(f"Seeded {counts} in {time.perf_counter() - started:.1f}s")
+
+        import sqlite3
+        with sqlite3.connect(path) as conn:
+            product_ids = [row[0] for row in conn.execute("SELECT id FROM products")]
+            args.users = conn.execute("SELECT COUNT(*) FROM users WHERE email LIKE 'user%@bench.example.com'").fetchone()[0]
+
+        runner = run_asgi if args.mode == "asgi" else run_uvicorn
+        print(f"Running '{args.workload}' for {args.duration:.0f}s with {args.concurrency} virtual users ({args.mode})")
+        results = asyncio.run(runner(args, product_ids))
+
+    print_report(results)
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        for key in ("workload", "mode", "workers", "concurrency", "products"):
+            if baseline["meta"].get(key) != getattr(args, key):
+                print(f"\nWarning: baseline has {key}={baseline['meta'].get(key)!r}, this run has {getattr(args, key)!r}")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nRegressed beyond {args.tolerance}%: {', '.join(regressions)}")
+            exit_code = 1
+
+    if args.save:
+        meta = {
+            key: getattr(args, key)
+            for key in ("workload", "mode", "workers", "concurrency", "duration", "users", "products", "tags", "carts", "seed")
+        }
+        meta.update(revision=_git_revision(), python=platform.python_version(), recorded_at=time.strftime("%Y-%m-%dT%H:%M:%S"))
+        with open(args.save, "w") as baseline_file:
+            json.dump({"meta": meta, "results": results}, baseline_file, indent=2)
+        print(f"Saved baseline to {args.save}")
+
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
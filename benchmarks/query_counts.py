@@ -0,0 +1,107 @@
+"""Query-count guard for the product listings: no N+1 may creep back in.
+
+Run from the project root:  python -m benchmarks.query_counts
+
+Mounts the product and admin routers on a throwaway SQLite database and
+counts the SQL statements each request sends (a before_cursor_execute
+listener on every engine). GET /products must cost the catalog version, the
+page query and one batched tag query at any page size. GET /admin/products/
+streams the whole catalog and pays the version, the listing and one tag
+query per EXPORT_BATCH_SIZE batch, however many rows each batch holds.
+Exits non-zero if any count differs.
+"""
+import argparse
+import math
+import os
+import random
+import tempfile
+
+
+# The catalog version, the page (or the streamed listing), one tag query per page or batch
+PRODUCTS_QUERIES = 3
+ADMIN_FIXED_QUERIES = 2
+
+CATEGORIES = ("electronics", "outdoor", "home", "kitchen")
+
+
+def seed(SessionLocal, products: int, tags: int):
+    from models import Product, Tag
+
+    rng = random.Random(1)
+    with SessionLocal() as db:
+        tag_rows = [Tag(name=f"tag{i}") for i in range(tags)]
+        db.add_all(tag_rows)
+        db.add_all([
+            Product(
+                name=f"product {i}",
+                description="d",
+                price=round(rng.uniform(1, 500), 2),
+                stock=rng.randint(0, 50),
+                category=CATEGORIES[i % len(CATEGORIES)],
+                tags=rng.sample(tag_rows, 3),
+            )
+            for i in range(products)
+        ])
+        db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=450)
+    parser.add_argument("--batch-size", type=int, default=100, help="EXPORT_BATCH_SIZE for the admin listing")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'queries.db')}"  # before anything imports config
+        os.environ["CATALOG_VERSION_TTL_SECONDS"] = "0"  # every request reads the version, so counts do not depend on timing
+        os.environ["EXPORT_BATCH_SIZE"] = str(args.batch_size)
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+        from sqlalchemy import event
+
+        from admin import router as admin_router
+        from database import SessionLocal, async_engine, async_read_engine, engine, read_engine
+        from dependencies import get_current_admin
+        from migrations import run_migrations
+        from products import router as products_router
+
+        run_migrations()
+        seed(SessionLocal, args.products, tags=50)
+
+        app = FastAPI()
+        app.include_router(admin_router, prefix="/admin")
+        app.include_router(products_router)
+        app.dependency_overrides[get_current_admin] = lambda: {"email": "admin@bench.example.com"}
+
+        statements = 0
+
+        def count(*_):
+            nonlocal statements
+            statements += 1
+
+        for bind in {engine, read_engine, async_engine.sync_engine, async_read_engine.sync_engine}:
+            event.listen(bind, "before_cursor_execute", count)
+        failures = []
+
+        def check(client, url, expected):
+            nonlocal statements
+            statements = 0
+            response = client.get(url)
+            assert response.status_code == 200, (url, response.status_code)
+            rows = len(response.json())
+            print(f"{url:>45}: {rows:4} products  {statements:2} queries (expected {expected})")
+            if statements != expected:
+                failures.append(url)
+
+        with TestClient(app) as client:
+            for limit in (1, 10, 50, 200):
+                check(client, f"/products?limit={limit}", PRODUCTS_QUERIES)
+            check(client, "/products?limit=200&sort=price_desc&in_stock=true", PRODUCTS_QUERIES)
+            check(client, "/products?limit=200&category=electronics&sort=name", PRODUCTS_QUERIES)
+            check(client, "/admin/products/", ADMIN_FIXED_QUERIES + math.ceil(args.products / args.batch_size))
+
+        assert not failures, f"query count changed for {failures}"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Rate limiter and write admission control: per-request overhead and load shedding.
+
+Run from the project root:  python -m benchmarks.ratelimit
+
+1. Raw token-bucket cost (MemoryBucketStore.take) with one hot key and
+   with many distinct keys.
+2. Requests/sec through a bare FastAPI app, in-process over ASGI: a plain
+   POST route, the same route behind limit_by_ip (with a limit it never
+   reaches), and both behind WriteAdmissionMiddleware.
+3. A write endpoint that serialises on one lock (like SQLite's single
+   writer) hit by more clients than it can serve, with and without the
+   admission cap: uncapped, every request queues behind the lock and
+   latency grows with the crowd; capped, the excess is shed with 503 and
+   the admitted requests stay fast.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def bucket_cost(keys: int, operations: int) -> float:
+    from ratelimit import MemoryBucketStore
+
+    store = MemoryBucketStore(max_keys=max(keys, 1))
+    started = time.perf_counter()
+    for i in range(operations):
+        store.take(f"bench:{i % keys}", 1e9, 10**9)
+    return (time.perf_counter() - started) / operations * 1e9
+
+
+async def throughput(app, path, requests, concurrency):
+    import httpx
+
+    remaining = requests
+
+    async def worker(client):
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            response = await client.post(path)
+            assert response.status_code == 200, response.status_code
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        await client.post(path)  # warm up
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        return requests / (time.perf_counter() - started)
+
+
+async def shedding(app, clients, rounds):
+    import httpx
+
+    latencies, statuses = [], []
+
+    async def client_loop(client):
+        for _ in range(rounds):
+            started = time.perf_counter()
+            response = await client.post("/slow")
+            statuses.append(response.status_code)
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - started)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120) as client:
+        await asyncio.gather(*(client_loop(client) for _ in range(clients)))
+    return latencies, statuses
+
+
+def build_app(admission=None, write_seconds=0.005):
+    from fastapi import Depends, FastAPI
+
+    from ratelimit import Rule, WriteAdmissionMiddleware, limit_by_ip
+
+    app = FastAPI()
+    never_reached = Rule("bench", 10**9, 1)
+    writer = asyncio.Lock()
+
+    @app.post("/plain")
+    async def plain():
+        return {"ok": True}
+
+    @app.post("/limited", dependencies=[Depends(limit_by_ip(never_reached))])
+    async def limited():
+        return {"ok": True}
+
+    @app.post("/slow")
+    async def slow():
+        async with writer:  # one write at a time, like the database writer
+            await asyncio.sleep(write_seconds)
+        return {"ok": True}
+
+    if admission is not None:
+        app.add_middleware(WriteAdmissionMiddleware, control=admission)
+    return app
+
+
+async def main_async(args):
+    from ratelimit import AdmissionControl
+
+    print(f"bucket take, 1 key:       {bucket_cost(1, args.operations):7.0f} ns")
+    print(f"bucket take, 100000 keys: {bucket_cost(100000, args.operations):7.0f} ns")
+    print()
+
+    for label, admission in (("no admission cap", None), ("admission cap", AdmissionControl(1000, 1))):
+        app = build_app(admission)
+        for path in ("/plain", "/limited"):
+            rate = await throughput(app, path, args.requests, args.concurrency)
+            print(f"{label:>16} {path:>9}: {rate:8.1f} req/s")
+    print()
+
+    for label, admission in (("uncapped", None), ("capped", AdmissionControl(args.slots, args.max_wait))):
+        latencies, statuses = await shedding(build_app(admission), args.clients, args.rounds)
+        shed = sum(1 for code in statuses if code == 503)
+        print(
+            f"{label:>9}: {len(latencies)} served, {shed} shed | served p50 {statistics.median(latencies) * 1000:7.1f} ms"
+            f"  p95 {percentile(latencies, 0.95) * 1000:7.1f} ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--operations", type=int, default=200000, help="bucket operations per microbenchmark")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--clients", type=int, default=64, help="concurrent clients in the shedding run")
+    parser.add_argument("--rounds", type=int, default=10, help="requests per client in the shedding run")
+    parser.add_argument("--slots", type=int, default=8, help="admission cap in the shedding run")
+    parser.add_argument("--max-wait", type=float, default=0.05, help="seconds a write may wait for a slot")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Seeds a SQLite database with benchmark volumes of users, products, tags and cart rows.
+
+Run from the project root:  python -m benchmarks.seed --db /tmp/bench.db --products 50000
+
+Uses the real models and migrations, so the seeded file has the same schema
+(indexes, search index) as a production database. Every seeded user shares
+the password ``SEED_PASSWORD``; ``admin@bench.example.com`` is an admin.
+"""
+import argparse
+import os
+import random
+import time
+
+from sqlalchemy import insert, select
+
+SEED_PASSWORD = "bench-password"
+ADMIN_EMAIL = "admin@bench.example.com"
+
+ADJECTIVES = (
+    "wireless", "portable", "organic", "vintage", "compact", "premium", "classic", "smart",
+    "waterproof", "leather", "wooden", "ceramic", "electric", "foldable", "ergonomic", "solar",
+)
+NOUNS = (
+    "headphones", "speaker", "backpack", "lamp", "kettle", "jacket", "sneakers", "notebook",
+    "blender", "camera", "tent", "watch", "keyboard", "mug", "chair", "bottle", "charger", "desk",
+)
+CATEGORIES = ("electronics", "outdoor", "home", "kitchen", "fashion", "office", "sports", "books")
+
+
+def user_email(index: int) -> str:
+    return f"user{index}@bench.example.com"
+
+
+def seed(url: str, users: int, products: int, tags: int, carts: int, tags_per_product: int = 3, seed_value: int = 1):
+    """Creates the schema at ``url`` and fills it; returns the row counts written."""
+    from database import create_db_engine
+    from migrations import run_migrations
+    from models import Cart, Product, Tag, User, product_tags
+    from passwords import pwd_context
+    from search import rebuild_search_index
+
+    rng = random.Random(seed_value)
+    engine = create_db_engine(url)
+    run_migrations(engine)
+    password = pwd_context.hash(SEED_PASSWORD)  # one hash shared by everyone: bcrypt is slow on purpose
+
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {
+                "email": ADMIN_EMAIL,
+                "password": password,
+                "first_name": "Bench",
+                "last_name": "Admin",
+                "phone_number": "admin-bench",
+                "is_admin": True,
+            },
+            *(
+                {
+                    "email": user_email(i),
+                    "password": password,
+                    "first_name": "Bench",
+                    "last_name": f"User{i}",
+                    "phone_number": f"bench-{i}",
+                    "is_admin": False,
+                }
+                for i in range(users)
+            ),
+        ])
+        conn.execute(insert(Tag), [{"name": f"tag-{i}"} for i in range(tags)])
+
+        for start in range(0, products, 5000):
+            conn.execute(insert(Product), [
+                {
+                    "name": f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}",
+                    "description": " ".join(rng.choice(ADJECTIVES + NOUNS) for _ in range(30)),
+                    "price": round(rng.uniform(1, 500), 2),
+                    "stock": 10**9,  # checkout workloads must never run out
+                    "category": rng.choice(CATEGORIES),
+                }
+                for i in range(start, min(start + 5000, products))
+            ])
+
+        product_ids = list(conn.execute(select(Product.id)).scalars())
+        tag_ids = list(conn.execute(select(Tag.id)).scalars())
+        user_ids = list(conn.execute(select(User.id).where(User.is_admin.is_(False))).scalars())
+
+        if tag_ids:
+            links = [
+                {"product_id": product_id, "tag_id": tag_id}
+                for product_id in product_ids
+                for tag_id in rng.sample(tag_ids, min(tags_per_product, len(tag_ids)))
+            ]
+            for start in range(0, len(links), 20000):
+                conn.execute(insert(product_tags), links[start:start + 20000])
+
+        if user_ids and product_ids:
+            pairs = set()
+            while len(pairs) < min(carts, len(user_ids) * len(product_ids)):
+                pairs.add((rng.choice(user_ids), rng.choice(product_ids)))
+            if pairs:
+                conn.execute(insert(Cart), [
+                    {"user_id": user_id, "product_id": product_id, "quantity": rng.randint(1, 3)}
+                    for user_id, product_id in pairs
+                ])
+
+        rebuild_search_index(conn)
+
+    engine.dispose()
+    return {"users": users + 1, "products": products, "tags": tags, "carts": min(carts, len(user_ids) * len(product_ids))}
+
+
+def add_arguments(parser):
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--tags", type=int, default=200)
+    parser.add_argument("--carts", type=int, default=2000, help="cart rows across all users")
+    parser.add_argument("--seed", type=int, default=1, help="random seed, for reproducible data")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", required=True, help="SQLite file to create (must not exist yet)")
+    add_arguments(parser)
+    args = parser.parse_args()
+    if os.path.exists(args.db):
+        parser.error(f"{args.db} already exists")
+
+    started = time.perf_counter()
+    counts = seed(f"sqlite:///{args.db}", args.users, args.products, args.tags, args.carts, seed_value=args.seed)
+    print(f"Seeded {args.db} in {time.perf_counter() - started:.1f}s: {counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Per-item cost of building a product listing body: today's paths vs. row-backed DTOs + orjson.
+
+Run from the project root:  python -m benchmarks.serialization
+
+Seeds a throwaway SQLite database, then times each path end to end (query,
+hydration, tag loading, JSON encoding) and encoding alone on pre-loaded
+inputs. Reported as microseconds per product, best of ``--repeat`` runs.
+
+  orm+pydantic  select(Product) + selectinload(tags) + ProductResponse.from_orm + json
+  orm+dict      select(Product) + batched tags + serialize_product + json
+  rows+dto      select(*PRODUCT_COLUMNS) + batched tags + ProductDTO + orjson
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--tags", type=int, default=3, help="tags per product")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        from sqlalchemy import insert, select
+        from sqlalchemy.orm import selectinload, sessionmaker
+
+        from catalog import PRODUCT_COLUMNS, ProductDTO, build_page, load_tag_names, serialize_product
+        from database import Base, create_db_engine
+        from models import Product, Tag, product_tags
+        from responses import dumps, orjson
+        from schemas import ProductResponse
+
+        engine = create_db_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+
+        with Session() as db:
+            db.execute(insert(Tag), [{"name": f"tag-{i}"} for i in range(50)])
+            db.execute(insert(Product), [
+                {
+                    "name": f"product {i}",
+                    "description": "lorem ipsum " * 20,
+                    "price": i * 1.25,
+                    "stock": i % 7,
+                    "category": f"c{i % 10}",
+                    "image_url": f"http://localhost:8080/uploads/{i:064x}.jpg",
+                }
+                for i in range(args.products)
+            ])
+            db.execute(insert(product_tags), [
+                {"product_id": i + 1, "tag_id": (i + t) % 50 + 1}
+                for i in range(args.products)
+                for t in range(args.tags)
+            ])
+            db.commit()
+
+        def orm_pydantic(db):
+            products = db.execute(select(Product).options(selectinload(Product.tags)).order_by(Product.id)).scalars().all()
+            return json.dumps([ProductResponse.from_orm(product).dict() for product in products]).encode()
+
+        def orm_dict(db):
+            products = db.execute(select(Product).order_by(Product.id)).scalars().all()
+            tag_names = load_tag_names(db, [product.id for product in products])
+            return json.dumps([serialize_product(product, tag_names[product.id]) for product in products]).encode()
+
+        def rows_dto(db):
+            rows = db.execute(select(*PRODUCT_COLUMNS).order_by(Product.id)).all()
+            return dumps(build_page(db, rows))
+
+        print(f"{args.products} products, {args.tags} tags each, encoder: {'orjson' if orjson else 'json'}")
+        print(f"{'path':>14} {'end-to-end':>12} {'encode only':>12}   (us/item)")
+
+        with Session() as db:
+            products = db.execute(select(Product).options(selectinload(Product.tags)).order_by(Product.id)).scalars().all()
+            tag_names = load_tag_names(db, [product.id for product in products])
+            rows = db.execute(select(*PRODUCT_COLUMNS).order_by(Product.id)).all()
+
+        encoders = {
+            "orm+pydantic": lambda: json.dumps([ProductResponse.from_orm(product).dict() for product in products]).encode(),
+            "orm+dict": lambda: json.dumps([serialize_product(product, tag_names[product.id]) for product in products]).encode(),
+            "rows+dto": lambda: dumps([ProductDTO.from_row(row, tag_names[row.id]) for row in rows]),
+        }
+        for name, path in (("orm+pydantic", orm_pydantic), ("orm+dict", orm_dict), ("rows+dto", rows_dto)):
+            def end_to_end():
+                with Session() as db:
+                    path(db)
+            total = best_of(args.repeat, end_to_end)
+            encode = best_of(args.repeat, encoders[name])
+            print(f"{name:>14} {total / args.products * 1e6:12.2f} {encode / args.products * 1e6:12.2f}")
+
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Worker cold-start time: interpreter + imports, app ready (lifespan done), first request served.
+
+Run from the project root:  python -m benchmarks.startup --runs 5 --workers 4
+
+Migrates a throwaway SQLite database once, then starts fresh Python
+processes that import ``main``, run the app's startup through a
+TestClient and serve GET /. Each run is measured alone, then ``--workers``
+processes are started at the same moment, the way a server with several
+workers (or an autoscaler adding instances) boots them.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+CHILD = """
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from starlette.testclient import TestClient
+with TestClient(main.app) as client:
+    ready = time.perf_counter()
+    assert client.get("/").status_code == 200
+    served = time.perf_counter()
+print(json.dumps({"import": imported - started, "ready": ready - started, "first_request": served - started}))
+"""
+
+
+def start_worker(env):
+    return subprocess.Popen([sys.executable, "-c", CHILD], env=env, stdout=subprocess.PIPE, text=True)
+
+
+def collect(process, launched):
+    output, _ = process.communicate()
+    if process.returncode != 0:
+        raise SystemExit(f"worker exited with {process.returncode}")
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings["process"] = time.perf_counter() - launched
+    return timings
+
+
+def report(label, samples):
+    print(f"{label:>10}: " + "  ".join(
+        f"{name} {statistics.median(sample[name] for sample in samples) * 1000:7.1f} ms"
+        for name in ("import", "ready", "first_request", "process")
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4, help="processes started at once in the second phase")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{os.path.join(directory, 'startup.db')}",
+            "UPLOAD_DIR": os.path.join(directory, "uploads"),
+            "SAVED_ITEM_SCAN_INTERVAL_SECONDS": "0",
+            "PYTHONPATH": os.getcwd(),
+        }
+        os.environ["DATABASE_URL"] = env["DATABASE_URL"]  # before anything imports config
+        from migrations import run_migrations
+        run_migrations()
+
+        samples = []
+        for _ in range(args.runs):
+            launched = time.perf_counter()
+            samples.append(collect(start_worker(env), launched))
+        report("alone", samples)
+
+        launched = time.perf_counter()
+        workers = [start_worker(env) for _ in range(args.workers)]
+        samples = [collect(worker, launched) for worker in workers]
+        report(f"{args.workers} at once", samples)
+        print(f"all {args.workers} workers ready after {max(sample['process'] for sample in samples) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Requests/sec for /uploads: Starlette's StaticFiles vs. static.ImmutableStaticFiles.
+
+Run from the project root:  python -m benchmarks.static_files
+
+Both mounts serve the same image from a temp directory, in-process over
+ASGI. Three client patterns are measured: a cold full download, a
+revalidation with If-None-Match (what browsers do without an immutable
+Cache-Control), and a ranged read of the first 64 KiB. Note the biggest
+win is not in these numbers: with ``immutable`` caching, browsers and the
+CDN stop sending most of these requests at all.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+
+async def measure(client, path, headers, requests, concurrency):
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            response = await client.get(path, headers=headers)
+            assert response.status_code in (200, 206, 304), response.status_code
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - started)
+
+
+async def main_async(args, directory, filename):
+    import httpx
+    from starlette.applications import Starlette
+    from starlette.routing import Mount
+    from starlette.staticfiles import StaticFiles
+
+    from static import ImmutableStaticFiles
+
+    for label, files in (("StaticFiles", StaticFiles(directory=directory)), ("Immutable", ImmutableStaticFiles(directory=directory))):
+        app = Starlette(routes=[Mount("/uploads", files)])
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            path = f"/uploads/{filename}"
+            etag = (await client.get(path)).headers["etag"]
+            results = {
+                "full": await measure(client, path, {}, args.requests, args.concurrency),
+                "304": await measure(client, path, {"If-None-Match": etag}, args.requests, args.concurrency),
+                "range": await measure(client, path, {"Range": "bytes=0-65535"}, args.requests, args.concurrency),
+            }
+        print(f"{label:>12}: " + "  ".join(f"{name} {rate:8.1f} req/s" for name, rate in results.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-kb", type=int, default=512)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = "0" * 64 + ".jpg"
+        with open(os.path.join(directory, filename), "wb") as image:
+            image.write(b"\xff\xd8\xff" + os.urandom(args.size_kb * 1024))
+        asyncio.run(main_async(args, directory, filename))
+
+
+if __name__ == "__main__":
+    main()
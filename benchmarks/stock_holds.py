@@ -0,0 +1,186 @@
+"""Flash sale with and without cart stock holds, and the expiry sweeper's throughput.
+
+Run from the project root:  python -m benchmarks.stock_holds
+
+"no holds" is the old flow: every buyer's add-to-cart passes a stock check,
+then all of them race at checkout and most lose there. "holds" adds to cart
+through inventory.set_holds: buyers who get a hold cannot lose at checkout,
+and the rest are turned away at add-to-cart. Exits non-zero if stock is
+oversold or reserved counts drift.
+
+The sweep part expires a large batch of holds spread over many products
+and reports holds released per second. The churn part has carts renewing
+holds that expire at once while the sweeper runs, and checks that reserved
+still equals the units held.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import func, insert, select, update
+
+from benchmarks.checkout_concurrency import make_session_factory, seed_users
+from checkout import place_order
+from inventory import set_holds
+from jobs import run_stock_hold_sweep
+from models import Cart, OrderItem, Product, StockHold
+
+
+def run_in_threads(user_ids, work):
+    barrier = threading.Barrier(len(user_ids))
+    results = {}
+
+    def worker(user_id):
+        barrier.wait()
+        results[user_id] = work(user_id)
+
+    threads = [threading.Thread(target=worker, args=(user_id,)) for user_id in user_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def flash_sale(SessionLocal, label, buyers, stock, use_holds):
+    with SessionLocal() as db:
+        product = Product(name=f"flash-{label}", description="d", price=10.0, stock=stock, category="bench")
+        db.add(product)
+        db.commit()
+        product_id = product.id
+        user_ids = seed_users(db, buyers, f"{label}-")
+
+    def add_to_cart(user_id):
+        with SessionLocal() as db:
+            product = db.execute(select(Product.stock).where(Product.id == product_id)).first()
+            if product.stock < 1:
+                return False
+            db.execute(insert(Cart).values(user_id=user_id, product_id=product_id, quantity=1))
+            if use_holds and set_holds(db, user_id, {product_id: 1}):
+                db.rollback()
+                return False
+            db.commit()
+            return True
+
+    def checkout(user_id):
+        started = time.perf_counter()
+        with SessionLocal() as db:
+            try:
+                place_order(db, user_id)
+                ok = True
+            except HTTPException:
+                ok = False
+        return ok, (time.perf_counter() - started) * 1000
+
+    added = run_in_threads(user_ids, add_to_cart)
+    in_cart = [user_id for user_id, ok in added.items() if ok]
+    outcomes = run_in_threads(in_cart, checkout)
+
+    sold = sum(1 for ok, _ in outcomes.values() if ok)
+    failed = len(outcomes) - sold
+    latencies = [elapsed for _, elapsed in outcomes.values()]
+    with SessionLocal() as db:
+        remaining, reserved = db.execute(select(Product.stock, Product.reserved).where(Product.id == product_id)).first()
+        recorded = db.scalar(select(func.coalesce(func.sum(OrderItem.quantity), 0)).where(OrderItem.product_id == product_id))
+        held = db.scalar(select(func.coalesce(func.sum(StockHold.quantity), 0)).where(StockHold.product_id == product_id))
+
+    print(
+        f"{label:>8}: {buyers} buyers, stock {stock} | rejected at add-to-cart {buyers - len(in_cart):4}"
+        f"  failed checkouts {failed:4}  sold {sold:3} | checkout p50 {statistics.median(latencies):6.1f} ms"
+    )
+    assert sold == recorded == min(buyers, stock) and remaining == stock - sold, "oversold or undersold"
+    assert reserved == held == 0, "reserved count drifted"
+
+
+def sweep(SessionLocal, holds, products):
+    with SessionLocal() as db:
+        db.execute(insert(Product), [
+            {"name": f"sweep-{i}", "description": "d", "price": 1.0, "stock": 10**6, "category": "bench"} for i in range(products)
+        ])
+        product_ids = db.execute(select(Product.id).where(Product.name.like("sweep-%"))).scalars().all()
+        user_ids = seed_users(db, -(-holds // products), "sweep-")
+        expired = datetime.utcnow() - timedelta(seconds=1)
+        rows = [
+            {"user_id": user_ids[i // products], "product_id": product_ids[i % products], "quantity": 2, "expires_at": expired}
+            for i in range(holds)
+        ]
+        db.execute(insert(StockHold), rows)
+        for product_id in product_ids:
+            held = sum(row["quantity"] for row in rows if row["product_id"] == product_id)
+            db.execute(update(Product).where(Product.id == product_id).values(reserved=held))
+        db.commit()
+
+    started = time.perf_counter()
+    swept = run_stock_hold_sweep(SessionLocal)
+    elapsed = time.perf_counter() - started
+
+    with SessionLocal() as db:
+        reserved = db.scalar(select(func.sum(Product.reserved)).where(Product.id.in_(product_ids)))
+        left = db.scalar(select(func.count()).select_from(StockHold))
+    print(f"   sweep: {swept} holds over {products} products in {elapsed:.2f} s ({swept / elapsed:,.0f} holds/s)")
+    assert reserved == 0 and left == 0, "sweep left holds or reserved units behind"
+
+
+def churn(SessionLocal, carts, rounds):
+    with SessionLocal() as db:
+        db.execute(insert(Product), [
+            {"name": f"churn-{i}", "description": "d", "price": 1.0, "stock": 10**6, "category": "bench"} for i in range(4)
+        ])
+        db.commit()
+        product_ids = db.execute(select(Product.id).where(Product.name.like("churn-%"))).scalars().all()
+        user_ids = seed_users(db, carts, "churn-")
+
+    done = threading.Event()
+
+    def sweeper():
+        while not done.is_set():
+            run_stock_hold_sweep(SessionLocal)
+
+    def renew(user_id):
+        for _ in range(rounds):
+            with SessionLocal() as db:
+                # ttl=0: every hold is already expired, so the sweeper races each renewal
+                set_holds(db, user_id, {product_id: random.randint(0, 3) for product_id in product_ids}, ttl=0)
+                db.commit()
+
+    thread = threading.Thread(target=sweeper)
+    thread.start()
+    started = time.perf_counter()
+    run_in_threads(user_ids, renew)
+    elapsed = time.perf_counter() - started
+    done.set()
+    thread.join()
+
+    with SessionLocal() as db:
+        reserved = db.scalar(select(func.sum(Product.reserved)).where(Product.id.in_(product_ids)))
+        held = db.scalar(select(func.coalesce(func.sum(StockHold.quantity), 0)))
+    print(f"   churn: {carts * rounds} renewals against the sweeper in {elapsed:.2f} s | reserved {reserved}  held {held}")
+    assert reserved == held, "reserved count drifted from the holds"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--buyers", type=int, default=200)
+    parser.add_argument("--stock", type=int, default=20)
+    parser.add_argument("--holds", type=int, default=50000)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--carts", type=int, default=16, help="concurrent carts in the churn run")
+    parser.add_argument("--rounds", type=int, default=100, help="hold renewals per cart in the churn run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        SessionLocal = make_session_factory(os.path.join(tmp, "bench.db"))
+        flash_sale(SessionLocal, "no holds", args.buyers, args.stock, use_holds=False)
+        flash_sale(SessionLocal, "holds", args.buyers, args.stock, use_holds=True)
+        sweep(SessionLocal, args.holds, args.products)
+        churn(SessionLocal, args.carts, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
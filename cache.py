@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import OrderedDict
+
+from config import CATALOG_CACHE_MAX_BYTES, CATALOG_CACHE_MAX_ENTRIES, CATALOG_CACHE_TTL_SECONDS
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ``ttl`` seconds.
+
+    ``max_bytes`` optionally bounds the summed ``sizeof(value)`` of all entries.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, max_bytes: int | None = None, sizeof=len):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, key, value, ttl: float | None = None):
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            self._remove(key)
+            return entry[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class CatalogCache(TTLCache):
+    """Serialized catalog pages, keyed by the catalog version they were built from.
+
+    The version is the database-backed one (see catalog.read_catalog_version),
+    so a write in any worker makes older pages unreachable here as well.
+    ``bump()`` runs after a local catalog write commits and frees the stale
+    pages right away instead of leaving them to age out.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, max_bytes: int):
+        # Values are (body bytes, extra headers); only the body counts towards the bound
+        super().__init__(max_entries, ttl, max_bytes=max_bytes, sizeof=lambda value: len(value[0]))
+        self.invalidations = 0
+
+    def get_page(self, key, version: int):
+        return self.get((version, key))
+
+    def set_page(self, key, body: bytes, headers: dict, version: int):
+        self.set((version, key), (body, headers))
+
+    def bump(self):
+        with self._lock:
+            self.invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        return {"invalidations": self.invalidations, **super().stats()}
+
+
+# ✅ Shared by every catalog reader and writer in this process
+catalog_cache = CatalogCache(
+    max_entries=CATALOG_CACHE_MAX_ENTRIES,
+    ttl=CATALOG_CACHE_TTL_SECONDS,
+    max_bytes=CATALOG_CACHE_MAX_BYTES,
+)
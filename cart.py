@@ -1,17 +1,102 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from database import get_db
-from models import Cart, Product, Order
-from schemas import CartItemCreate, CartItemResponse
-from dependencies import get_current_user
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from database import get_async_db, get_async_read_db, upsert_insert
+from models import Cart, Product, StockHold
+from schemas import CartItemCreate, CartItemResponse, CartItemsUpdate
+from idempotency import idempotency_store
+from responses import dumps
+from dependencies import CurrentUser, get_current_user
+from checkout import place_order
+from inventory import set_holds
+from ratelimit import CART_WRITE_PER_USER, CHECKOUT_PER_USER, limit_by_user
 
 router = APIRouter()
 
+# ---------------- UPSERT HELPERS ----------------
+def _cart_key(user_id: int, product_id: int):
+    return (Cart.user_id == user_id, Cart.product_id == product_id)
+
+
+async def _increment_item(db: AsyncSession, user_id: int, product_id: int, quantity: int, stock: int):
+    """Adds ``quantity`` to the cart row in one statement; returns (id, quantity), or None if stock would be exceeded."""
+    statement = upsert_insert(db.bind, Cart)
+    if statement is not None:
+        statement = statement.values(user_id=user_id, product_id=product_id, quantity=quantity)
+        statement = statement.on_conflict_do_update(
+            index_elements=[Cart.user_id, Cart.product_id],
+            set_={"quantity": Cart.quantity + statement.excluded.quantity},
+            where=(Cart.quantity + statement.excluded.quantity) <= stock,
+        )
+        return (await db.execute(statement.returning(Cart.id, Cart.quantity))).first()
+
+    # No ON CONFLICT on this backend: update first, insert if there was nothing to update
+    result = await db.execute(
+        update(Cart)
+        .where(*_cart_key(user_id, product_id), Cart.quantity + quantity <= stock)
+        .values(quantity=Cart.quantity + quantity)
+    )
+    if result.rowcount == 0:
+        if await db.scalar(select(Cart.id).where(*_cart_key(user_id, product_id))) is not None:
+            return None
+        await db.execute(insert(Cart).values(user_id=user_id, product_id=product_id, quantity=quantity))
+    return (await db.execute(select(Cart.id, Cart.quantity).where(*_cart_key(user_id, product_id)))).first()
+
+
+async def _set_items(db: AsyncSession, user_id: int, rows: list) -> list:
+    """Sets absolute quantities for many products with one upsert; returns (id, product_id, quantity) rows."""
+    statement = upsert_insert(db.bind, Cart)
+    if statement is not None:
+        statement = statement.on_conflict_do_update(
+            index_elements=[Cart.user_id, Cart.product_id],
+            set_={"quantity": statement.excluded.quantity},
+        )
+        return (await db.execute(statement.returning(Cart.id, Cart.product_id, Cart.quantity), rows)).all()
+
+    for row in rows:
+        result = await db.execute(update(Cart).where(*_cart_key(user_id, row["product_id"])).values(quantity=row["quantity"]))
+        if result.rowcount == 0:
+            await db.execute(insert(Cart).values(**row))
+    return (await db.execute(
+        select(Cart.id, Cart.product_id, Cart.quantity)
+        .where(Cart.user_id == user_id, Cart.product_id.in_([row["product_id"] for row in rows]))
+    )).all()
+
+
+async def _idempotent(user_id: int, key: Optional[str], payload, handler):
+    """Runs ``handler`` once per Idempotency-Key; retries get the first response replayed."""
+    if key is None:
+        return await handler()
+
+    fingerprint = idempotency_store.fingerprint(payload)
+    replay = idempotency_store.claim(user_id, key, fingerprint)
+    if replay is not None:
+        status_code, body = replay
+        return Response(content=body, status_code=status_code, media_type="application/json", headers={"Idempotent-Replayed": "true"})
+
+    try:
+        result = await handler()
+    except BaseException:
+        idempotency_store.release(user_id, key)
+        raise
+    body = dumps(result)
+    idempotency_store.complete(user_id, key, fingerprint, status.HTTP_200_OK, body)
+    return Response(content=body, media_type="application/json")
+
 # ---------------- ADD TO CART ----------------
+# No Idempotency-Key here: adding increments, and keys are only remembered per process, so a
+# retry on another worker would add twice. Clients that retry should use PUT /cart/items.
 @router.post("/add", response_model=CartItemResponse)
-def add_to_cart(cart_item: CartItemCreate, db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
-    # Validate product existence
-    product = db.query(Product).filter(Product.id == cart_item.product_id).first()
+async def add_to_cart(
+    cart_item: CartItemCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(limit_by_user(CART_WRITE_PER_USER))
+):
+    # Validate product existence (and lock its row first, the order every hold change takes)
+    product = (await db.execute(
+        select(Product.name, Product.price, Product.stock).where(Product.id == cart_item.product_id).with_for_update()
+    )).first()
     if not product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
 
@@ -21,35 +106,101 @@ def add_to_cart(cart_item: CartItemCreate, db: Session = Depends(get_db), curren
     if cart_item.quantity > product.stock:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Not enough stock available")
 
-    # Check if item is already in the cart
-    existing_cart_item = db.query(Cart).filter(Cart.user_id == current_user.id, Cart.product_id == cart_item.product_id).first()
-    
-    if existing_cart_item:
-        # Update quantity only if within stock limit
-        if existing_cart_item.quantity + cart_item.quantity > product.stock:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Not enough stock for this update")
-        existing_cart_item.quantity += cart_item.quantity
-    else:
-        # Create new cart item
-        new_cart_item = Cart(user_id=current_user.id, product_id=cart_item.product_id, quantity=cart_item.quantity)
-        db.add(new_cart_item)
-        db.commit()
-        db.refresh(new_cart_item)
-        return new_cart_item
-    
-    db.commit()
-    db.refresh(existing_cart_item)
-    return existing_cart_item
+    # ✅ Insert or add to the existing row in one statement (no lookup, no duplicate-row race)
+    saved_item = await _increment_item(db, current_user.id, cart_item.product_id, cart_item.quantity, product.stock)
+    if saved_item is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Not enough stock for this update")
+    # ✅ Hold the whole line for CART_HOLD_TTL_SECONDS, so checkout cannot fail on it meanwhile
+    if await db.run_sync(set_holds, current_user.id, {cart_item.product_id: saved_item.quantity}):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Not enough stock available")
+    await db.commit()
+
+    return CartItemResponse(
+        id=saved_item.id,
+        product_id=cart_item.product_id,
+        quantity=saved_item.quantity,
+        product_name=product.name,
+        product_price=product.price
+    )
+
+# ---------------- SET MANY CART ITEMS ----------------
+@router.put("/items", response_model=list[CartItemResponse])
+async def set_cart_items(
+    cart_update: CartItemsUpdate,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(limit_by_user(CART_WRITE_PER_USER))
+):
+    """Sets the quantity of many products at once; quantity 0 removes the product from the cart."""
+    async def apply():
+        quantities = {}
+        for item in cart_update.items:
+            if item.product_id in quantities:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Product ID {item.product_id} is listed twice")
+            if item.quantity < 0:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Quantity cannot be negative")
+            quantities[item.product_id] = item.quantity
+        if not quantities:
+            return []
+
+        # ✅ Every product validated against stock in one query (rows locked in id order, as hold changes need)
+        products = {
+            row.id: row
+            for row in await db.execute(
+                select(Product.id, Product.name, Product.price, Product.stock)
+                .where(Product.id.in_(list(quantities)))
+                .order_by(Product.id)
+                .with_for_update()
+            )
+        }
+        missing = [product_id for product_id in quantities if product_id not in products]
+        if missing:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Products not found: {missing}")
+        short = [products[product_id].name for product_id, quantity in quantities.items() if quantity > products[product_id].stock]
+        if short:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Not enough stock for: {', '.join(short)}")
+
+        removed = [product_id for product_id, quantity in quantities.items() if quantity == 0]
+        if removed:
+            await db.execute(delete(Cart).where(Cart.user_id == current_user.id, Cart.product_id.in_(removed)))
+
+        rows = [
+            {"user_id": current_user.id, "product_id": product_id, "quantity": quantity}
+            for product_id, quantity in quantities.items()
+            if quantity > 0
+        ]
+        saved = {row.product_id: row for row in (await _set_items(db, current_user.id, rows) if rows else [])}
+        # ✅ Holds follow the new quantities in one batch; removed lines give theirs back
+        unavailable = await db.run_sync(set_holds, current_user.id, quantities)
+        if unavailable:
+            names = ", ".join(products[product_id].name for product_id in unavailable)
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Not enough stock available for: {names}")
+        await db.commit()
+
+        return [
+            CartItemResponse(
+                id=saved[product_id].id,
+                product_id=product_id,
+                quantity=saved[product_id].quantity,
+                product_name=products[product_id].name,
+                product_price=products[product_id].price
+            ).dict()
+            for product_id in quantities
+            if product_id in saved
+        ]
+
+    payload = ["items", [item.dict() for item in cart_update.items]]
+    return await _idempotent(current_user.id, idempotency_key, payload, apply)
 
 # ---------------- VIEW CART ----------------
 @router.get("/", response_model=list[CartItemResponse])
-def view_cart(db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
-    cart_items = (
-        db.query(Cart, Product.name, Product.price)
+async def view_cart(db: AsyncSession = Depends(get_async_read_db), current_user: CurrentUser = Depends(get_current_user)):
+    cart_items = (await db.execute(
+        select(Cart, Product.name, Product.price, StockHold.quantity.label("held"), StockHold.expires_at)
         .join(Product, Cart.product_id == Product.id)
-        .filter(Cart.user_id == current_user.id)
-        .all()
-    )
+        .outerjoin(StockHold, (StockHold.user_id == Cart.user_id) & (StockHold.product_id == Cart.product_id))
+        .where(Cart.user_id == current_user.id)
+    )).all()
 
     return [
         CartItemResponse(
@@ -57,64 +208,28 @@ def view_cart(db: Session = Depends(get_db), current_user: dict = Depends(get_cu
             product_id=item.Cart.product_id,
             quantity=item.Cart.quantity,
             product_name=item.name,
-            product_price=item.price
+            product_price=item.price,
+            held_quantity=item.held or 0,
+            held_until=item.expires_at
         )
         for item in cart_items
     ]
 
 # ---------------- REMOVE FROM CART ----------------
 @router.delete("/remove/{product_id}")
-def remove_from_cart(product_id: int, db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
-    cart_item = db.query(Cart).filter(Cart.user_id == current_user.id, Cart.product_id == product_id).first()
-
-    if not cart_item:
+async def remove_from_cart(product_id: int, db: AsyncSession = Depends(get_async_db), current_user: CurrentUser = Depends(get_current_user)):
+    await db.run_sync(set_holds, current_user.id, {product_id: 0})  # gives the held units back
+    result = await db.execute(delete(Cart).where(*_cart_key(current_user.id, product_id)))
+    if result.rowcount == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not in cart")
+    await db.commit()
 
-    db.delete(cart_item)
-    db.commit()
-    
     return {"message": "Item removed from cart successfully"}
 
 # ---------------- CHECKOUT ----------------
 @router.post("/checkout")
-def checkout(db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
-    # Get all cart items for the current user
-    cart_items = db.query(Cart).filter(Cart.user_id == current_user.id).all()
-
-    if not cart_items:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cart is empty")
-
-    total_cost = 0
-
-    # Process each cart item
-    for item in cart_items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-
-        if not product:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Product ID {item.product_id} not found")
-        
-        if product.stock < item.quantity:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Not enough stock for {product.name}")
-
-        # Reduce stock
-        product.stock -= item.quantity  
-
-        # Calculate total cost
-        total_cost += product.price * item.quantity
-
-        # Move cart item to orders table
-        new_order = Order(
-            user_id=current_user.id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            total_price=product.price * item.quantity
-        )
-        db.add(new_order)
-
-        # Remove item from cart
-        db.delete(item)
-
-    # Commit changes to the database
-    db.commit()
+async def checkout(db: AsyncSession = Depends(get_async_db), current_user: CurrentUser = Depends(limit_by_user(CHECKOUT_PER_USER))):
+    # The checkout engine is plain Session code; run_sync drives it on the async connection
+    order = await db.run_sync(place_order, current_user.id)
 
-    return {"message": "Checkout successful", "total_cost": total_cost}
+    return {"message": "Checkout successful", "order_id": order.id, "total_cost": order.total_price}
@@ -0,0 +1,272 @@
+import base64
+import json
+import math
+from dataclasses import dataclass
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from sqlalchemy import and_, event, or_, select, update
+from sqlalchemy.orm import Session
+
+from cache import TTLCache, catalog_cache
+from config import CATALOG_VERSION_TTL_SECONDS, EXPORT_BATCH_SIZE
+from database import ReadSessionLocal
+from images import image_variant_urls
+from models import CatalogMeta, Product, Tag, product_tags
+from responses import dumps, stream_json_array
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# ✅ Columns a product DTO is built from, in ProductDTO field order
+PRODUCT_COLUMNS = (
+    Product.id,
+    Product.name,
+    Product.price,
+    Product.stock,
+    Product.description,
+    Product.category,
+    Product.image_url,
+)
+
+# ✅ Sort option -> (column, descending). Product.id is always the tie-breaker.
+SORT_OPTIONS = {
+    "id": (Product.id, False),
+    "newest": (Product.id, True),
+    "price_asc": (Product.price, False),
+    "price_desc": (Product.price, True),
+    "name": (Product.name, False),
+}
+
+# ✅ JSON types a cursor's sort value may have, by sort column
+CURSOR_VALUE_TYPES = {"id": int, "price": (int, float), "name": str}
+
+
+# ---------------- CURSORS ----------------
+def pack_cursor(value, last_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([value, last_id]).encode()).decode()
+
+
+def encode_cursor(sort: str, product: Product) -> str:
+    column, _ = SORT_OPTIONS[sort]
+    return pack_cursor(getattr(product, column.key), product.id)
+
+
+def decode_cursor(cursor: str):
+    """Returns the (sort value, product id) pair stored in a cursor, or raises ValueError."""
+    try:
+        value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not _is_bindable(last_id, int):
+        raise ValueError("Invalid cursor")
+    return value, last_id
+
+
+def _is_bindable(value, types) -> bool:
+    # bool is an int to isinstance; out-of-range integers and NaN/Infinity would fail or misbehave in SQL
+    if isinstance(value, bool) or not isinstance(value, types):
+        return False
+    if isinstance(value, int):
+        return -2**63 <= value < 2**63
+    if isinstance(value, float):
+        return math.isfinite(value)
+    return True
+
+
+# ---------------- LISTING QUERY ----------------
+def build_listing_query(
+    sort: str = "id",
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    in_stock: Optional[bool] = None,
+    tag: Optional[str] = None,
+):
+    """Builds a keyset-paginated query over PRODUCT_COLUMNS (row tuples, no ORM objects).
+
+    One extra row is fetched so callers can tell whether another page exists
+    without a COUNT over the whole catalog.
+    """
+    if sort not in SORT_OPTIONS:
+        raise ValueError("Invalid sort option")
+    column, descending = SORT_OPTIONS[sort]
+
+    query = select(*PRODUCT_COLUMNS)
+
+    if category is not None:
+        query = query.where(Product.category == category)
+    if min_price is not None:
+        query = query.where(Product.price >= min_price)
+    if max_price is not None:
+        query = query.where(Product.price <= max_price)
+    if in_stock is True:
+        query = query.where(Product.stock > 0)
+    elif in_stock is False:
+        query = query.where(Product.stock <= 0)
+    if tag is not None:
+        tagged = (
+            select(product_tags.c.product_id)
+            .join(Tag, Tag.id == product_tags.c.tag_id)
+            .where(Tag.name == tag)
+        )
+        query = query.where(Product.id.in_(tagged))
+
+    if cursor is not None:
+        value, last_id = decode_cursor(cursor)
+        if not _is_bindable(value, CURSOR_VALUE_TYPES[column.key]):
+            raise ValueError("Invalid cursor")
+        if column is Product.id:
+            query = query.where(Product.id < last_id if descending else Product.id > last_id)
+        elif descending:
+            query = query.where(or_(column < value, and_(column == value, Product.id < last_id)))
+        else:
+            query = query.where(or_(column > value, and_(column == value, Product.id > last_id)))
+
+    if column is Product.id:
+        query = query.order_by(Product.id.desc() if descending else Product.id.asc())
+    elif descending:
+        query = query.order_by(column.desc(), Product.id.desc())
+    else:
+        query = query.order_by(column.asc(), Product.id.asc())
+
+    return query.limit(limit + 1)
+
+
+def load_tag_names(db, product_ids) -> dict:
+    """Loads tag names for many products in one query, keyed by product id."""
+    tag_names = {product_id: [] for product_id in product_ids}
+    if not tag_names:
+        return tag_names
+
+    rows = db.execute(
+        select(product_tags.c.product_id, Tag.name)
+        .join(Tag, Tag.id == product_tags.c.tag_id)
+        .where(product_tags.c.product_id.in_(list(tag_names)))
+        .order_by(product_tags.c.product_id, Tag.id)
+    )
+    for product_id, name in rows:
+        tag_names[product_id].append(name)
+    return tag_names
+
+
+# ---------------- SERIALIZATION ----------------
+@dataclass(slots=True)
+class ProductDTO:
+    """Public product shape, built straight from a PRODUCT_COLUMNS row; orjson encodes it natively."""
+    id: int
+    name: str
+    price: float
+    stock: int
+    description: str
+    category: str
+    image_url: Optional[str]
+    image_variants: dict
+    tags: list
+
+    @classmethod
+    def from_row(cls, row, tags: list) -> "ProductDTO":
+        return cls(*row, image_variant_urls(row[6]), tags)
+
+
+def load_product_rows(db, product_ids: list) -> list:
+    """PRODUCT_COLUMNS rows for ``product_ids``, in the order given."""
+    if not product_ids:
+        return []
+    rows = {row.id: row for row in db.execute(select(*PRODUCT_COLUMNS).where(Product.id.in_(product_ids)))}
+    return [rows[product_id] for product_id in product_ids if product_id in rows]
+
+
+def build_page(db, rows) -> list:
+    """DTOs for a page of rows, with all of their tags loaded in one query."""
+    tag_names = load_tag_names(db, [row.id for row in rows])
+    return [ProductDTO.from_row(row, tag_names[row.id]) for row in rows]
+
+
+def stream_catalog(batch_size: int = EXPORT_BATCH_SIZE):
+    """Yields every product as one JSON array, a chunk per server-side cursor batch.
+
+    Memory stays at one batch of rows however big the catalog is.
+    """
+    with ReadSessionLocal() as db:
+        result = db.execute(
+            select(*PRODUCT_COLUMNS).order_by(Product.id),
+            execution_options={"yield_per": batch_size},
+        )
+        yield from stream_json_array(dumps(build_page(db, rows)) for rows in result.partitions())
+
+
+def serialize_product(product: Product, tags: list) -> dict:
+    return {
+        "id": product.id,
+        "name": product.name,
+        "price": product.price,
+        "stock": product.stock,
+        "description": product.description,
+        "category": product.category,
+        "image_url": product.image_url,
+        "image_variants": image_variant_urls(product.image_url),
+        "tags": tags,
+    }
+
+
+def split_page(rows: list, limit: int, sort: str):
+    """Trims the look-ahead row and returns (page rows, next cursor or None)."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(sort, rows[-1])
+    return rows, None
+
+
+# ---------------- CATALOG VERSION ----------------
+CATALOG_META_ID = 1
+
+
+class CatalogVersion(NamedTuple):
+    version: int
+    updated_at: Optional[datetime]
+
+
+# ✅ The last version read, reused for a moment so cache hits and 304s don't need a query each
+_version_cache = TTLCache(max_entries=1, ttl=CATALOG_VERSION_TTL_SECONDS)
+
+
+def read_catalog_version(db) -> CatalogVersion:
+    version = _version_cache.get(CATALOG_META_ID)
+    if version is None:
+        row = db.execute(
+            select(CatalogMeta.version, CatalogMeta.updated_at).where(CatalogMeta.id == CATALOG_META_ID)
+        ).first()
+        version = CatalogVersion(*row) if row is not None else CatalogVersion(0, None)
+        _version_cache.set(CATALOG_META_ID, version)
+    return version
+
+
+def mark_catalog_changed(db: Session):
+    """Moves the catalog version forward inside the caller's transaction.
+
+    Call it as the last statement before commit: the version row stays
+    locked until then. Once the transaction commits, this process's page
+    cache is dropped as well.
+    """
+    db.execute(
+        update(CatalogMeta)
+        .where(CatalogMeta.id == CATALOG_META_ID)
+        .values(version=CatalogMeta.version + 1, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.info["catalog_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _drop_stale_pages(session):
+    if session.info.pop("catalog_changed", False):
+        _version_cache.clear()
+        catalog_cache.bump()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_catalog_change(session):
+    session.info.pop("catalog_changed", None)
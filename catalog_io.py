@@ -0,0 +1,226 @@
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from catalog import load_tag_names, mark_catalog_changed
+from config import EXPORT_BATCH_SIZE, IMPORT_MAX_ERRORS
+from database import ReadSessionLocal, upsert_insert
+from models import Product, product_tags
+from schemas import ProductCreate
+from search import index_products
+from tags import resolve_tag_ids
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+EXPORT_FIELDS = ("id", "name", "description", "price", "stock", "category", "image_url", "tags")
+CSV_TAG_SEPARATOR = "|"
+
+
+@dataclass
+class ImportReport:
+    received: int = 0
+    created: int = 0
+    skipped: int = 0
+    failed: int = 0
+    errors: list = field(default_factory=list)
+
+    def error(self, line: int, message: str):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+
+def detect_format(content_type: str | None):
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    for name, expected in FORMATS.items():
+        if media_type == expected:
+            return name
+    return None
+
+
+# ---------------- PARSING ----------------
+async def _lines(chunks):
+    """Splits a byte stream into (line number, text) pairs without buffering the whole body."""
+    pending = b""
+    number = 0
+    async for chunk in chunks:
+        pending += chunk
+        *complete, pending = pending.split(b"\n")
+        for line in complete:
+            number += 1
+            yield number, line.decode("utf-8").rstrip("\r")
+    if pending:
+        yield number + 1, pending.decode("utf-8").rstrip("\r")
+
+
+async def _ndjson_records(chunks):
+    async for number, line in _lines(chunks):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield number, None
+            continue
+        yield number, record if isinstance(record, dict) else None
+
+
+async def _csv_records(chunks):
+    header = None
+    logical, first_line = [], 0
+    async for number, line in _lines(chunks):
+        if not logical:
+            first_line = number
+        logical.append(line)
+        # An odd number of quotes so far means a quoted field continues on the next line
+        if sum(part.count('"') for part in logical) % 2:
+            continue
+        values = next(csv.reader(["\n".join(logical)]), [])
+        logical = []
+        if not any(values):
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        record = {name: value for name, value in zip(header, values) if value != ""}
+        if "tags" in record:
+            record["tags"] = [tag.strip() for tag in record["tags"].split(CSV_TAG_SEPARATOR) if tag.strip()]
+        yield first_line, record
+    if logical:
+        yield first_line, None
+
+
+async def parse_products(chunks, fmt: str, report: ImportReport):
+    """Yields validated ProductCreate rows; bad rows are recorded on ``report`` and skipped."""
+    records = _ndjson_records(chunks) if fmt == "ndjson" else _csv_records(chunks)
+    async for number, record in records:
+        report.received += 1
+        if record is None:
+            report.error(number, f"Malformed {fmt} row")
+            continue
+        try:
+            yield number, ProductCreate(**record)
+        except ValidationError as exc:
+            report.error(number, "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors()))
+
+
+# ---------------- IMPORT ----------------
+def _insert_products(db, products: list) -> dict:
+    """Inserts products whose names were free a moment ago; returns name -> id for the ones inserted."""
+    rows = [
+        {
+            "name": product.name,
+            "description": product.description,
+            "price": product.price,
+            "stock": product.stock,
+            "category": product.category,
+            "image_url": product.image_url,
+        }
+        for product in products
+    ]
+    statement = upsert_insert(db.get_bind(), Product)
+    if statement is not None:
+        # A name taken since the duplicate check is skipped instead of failing the batch; RETURNING omits it
+        statement = statement.on_conflict_do_nothing(index_elements=[Product.name])
+        return dict(db.execute(statement.returning(Product.name, Product.id), rows).all())
+
+    product_ids = db.execute(insert(Product).returning(Product.id, sort_by_parameter_order=True), rows).scalars().all()
+    return dict(zip((product.name for product in products), product_ids))
+
+
+def insert_batch(db, rows: list, report: ImportReport, retry: bool = True):
+    """Inserts one batch of (line, ProductCreate) rows and commits it.
+
+    Names already in the catalog (or repeated within the batch) are skipped,
+    matching the single-product endpoint's duplicate check, and so are names
+    another request inserts while the batch is written. Products, their tag
+    links and their search entries each go in as one executemany.
+    """
+    names = [product.name for _, product in rows]
+    existing = set(db.execute(select(Product.name).where(Product.name.in_(names))).scalars())
+
+    fresh = []
+    for _, product in rows:
+        if product.name in existing:
+            continue
+        existing.add(product.name)
+        fresh.append(product)
+    if not fresh:
+        db.rollback()  # nothing to write; don't keep a transaction open while the next chunk streams in
+        report.skipped += len(rows)
+        return
+
+    try:
+        tag_ids = resolve_tag_ids(db, [tag for product in fresh for tag in product.tags])
+        product_ids = _insert_products(db, fresh)
+        fresh = [product for product in fresh if product.name in product_ids]
+
+        links = [
+            {"product_id": product_ids[product.name], "tag_id": tag_ids[tag]}
+            for product in fresh
+            for tag in dict.fromkeys(product.tags)
+        ]
+        if links:
+            db.execute(insert(product_tags), links)
+
+        index_products(db, [
+            {**product.dict(), "id": product_ids[product.name], "tags": list(dict.fromkeys(product.tags))}
+            for product in fresh
+        ])
+        if fresh:
+            mark_catalog_changed(db)
+        db.commit()
+    except IntegrityError:
+        # Backends without ON CONFLICT: a name was taken meanwhile, so check again and write the rest
+        db.rollback()
+        if not retry:
+            raise
+        insert_batch(db, rows, report, retry=False)
+        return
+    except BaseException:
+        db.rollback()
+        raise
+
+    report.created += len(fresh)
+    report.skipped += len(rows) - len(fresh)
+
+
+# ---------------- EXPORT ----------------
+def _export_chunk(fmt: str, rows, tag_names: dict) -> bytes:
+    records = [
+        {**row._asdict(), "tags": tag_names[row.id]}
+        for row in rows
+    ]
+    if fmt == "ndjson":
+        return "".join(json.dumps(record) + "\n" for record in records).encode()
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for record in records:
+        record["tags"] = CSV_TAG_SEPARATOR.join(record["tags"])
+        writer.writerow([record[name] for name in EXPORT_FIELDS])
+    return buffer.getvalue().encode()
+
+
+def export_products(fmt: str):
+    """Yields the whole catalog in ``fmt``, reading it through a server-side cursor in batches."""
+    columns = [getattr(Product, name) for name in EXPORT_FIELDS if name != "tags"]
+    with ReadSessionLocal() as db:
+        if fmt == "csv":
+            buffer = io.StringIO()
+            csv.writer(buffer).writerow(EXPORT_FIELDS)
+            yield buffer.getvalue().encode()
+
+        result = db.execute(
+            select(*columns).order_by(Product.id),
+            execution_options={"yield_per": EXPORT_BATCH_SIZE},
+        )
+        for rows in result.partitions():
+            yield _export_chunk(fmt, rows, load_tag_names(db, [row.id for row in rows]))
@@ -0,0 +1,114 @@
+from fastapi import HTTPException, status
+from sqlalchemy import bindparam, delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from catalog import mark_catalog_changed
+from inventory import held_quantities, lock_products
+from models import Cart, Order, OrderItem, Product, StockHold
+
+_products = Product.__table__
+
+# One cart line: stock drops by the units ordered, reserved by the units this cart held.
+# Matches no row if that would oversell, leaving other carts' holds untouched.
+_TAKE_STOCK = (
+    update(_products)
+    .where(
+        _products.c.id == bindparam("b_product_id"),
+        _products.c.stock >= bindparam("b_quantity"),
+        _products.c.stock - (_products.c.reserved - bindparam("b_held")) >= bindparam("b_quantity"),
+    )
+    .values(stock=_products.c.stock - bindparam("b_quantity"), reserved=_products.c.reserved - bindparam("b_held"))
+)
+
+
+def place_order(db: Session, user_id: int) -> Order:
+    """Turns the user's cart into one order in a single transaction and returns it.
+
+    Holds placed by the cart (see inventory.py) are converted as they are:
+    stock drops by the units ordered and reserved by the units held, which
+    always fits, so a fully held cart is not re-validated. Only units not
+    covered by a hold (it expired and was swept, or the cart predates
+    holds) are checked against what other carts leave available. Every line
+    is checked against the locked product rows, then decremented by one
+    executemany of a conditional ``UPDATE ... WHERE``, so the cost does not
+    grow a statement per line; the conditions still guard against
+    overselling, and any line they reject rolls the whole order back.
+    """
+    # ✅ One query for the whole cart and its products
+    items = db.execute(
+        select(Cart.id, Cart.product_id, Cart.quantity, Product.name, Product.price)
+        .join(Product, Product.id == Cart.product_id, isouter=True)
+        .where(Cart.user_id == user_id)
+        .order_by(Cart.product_id)  # stable lock order across concurrent checkouts
+    ).all()
+
+    if not items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cart is empty")
+
+    for item in items:
+        if item.name is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Product ID {item.product_id} not found")
+
+    try:
+        product_ids = [item.product_id for item in items]
+        products = {row.id: row for row in lock_products(db, product_ids)}
+        held = held_quantities(db, user_id, product_ids)
+
+        for item in items:
+            product = products.get(item.product_id)
+            if product is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Product ID {item.product_id} not found")
+            hold = held.get(item.product_id, 0)
+            if item.quantity > product.stock or item.quantity > product.stock - (product.reserved - hold):
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Not enough stock for {item.name}")
+
+        # ✅ Every line's decrement in one executemany, when the driver reports its total row count
+        lines = [
+            {"b_product_id": item.product_id, "b_quantity": item.quantity, "b_held": held.get(item.product_id, 0)}
+            for item in items
+        ]
+        if db.get_bind().dialect.supports_sane_multi_rowcount:
+            taken = db.execute(_TAKE_STOCK, lines).rowcount
+        else:
+            taken = sum(db.execute(_TAKE_STOCK, line).rowcount for line in lines)
+        if taken != len(items):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Stock changed during checkout, please retry")
+
+        order = Order(user_id=user_id, total_price=sum(item.price * item.quantity for item in items))
+        db.add(order)
+        db.flush()
+
+        # ✅ All line items in one bulk insert
+        db.execute(insert(OrderItem), [
+            {
+                "order_id": order.id,
+                "product_id": item.product_id,
+                "quantity": item.quantity,
+                "unit_price": item.price,
+                "total_price": item.price * item.quantity,
+            }
+            for item in items
+        ])
+
+        # A concurrent checkout of the same cart already claimed these rows
+        removed = db.execute(
+            delete(Cart)
+            .where(Cart.id.in_([item.id for item in items]))
+            .execution_options(synchronize_session=False)
+        )
+        if removed.rowcount != len(items):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Cart changed during checkout, please retry")
+        if held:
+            db.execute(
+                delete(StockHold)
+                .where(StockHold.user_id == user_id, StockHold.product_id.in_(list(held)))
+                .execution_options(synchronize_session=False)
+            )
+
+        mark_catalog_changed(db)  # stock levels changed
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+
+    return order
@@ -0,0 +1,126 @@
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from config import BROTLI_QUALITY, COMPRESSION_MIN_BYTES, GZIP_LEVEL
+from static import COMPRESSIBLE_TYPES
+
+try:  # brotli is optional: without it only gzip is offered
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class _GzipEncoder:
+    def __init__(self):
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31 = gzip framing
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        # Sync-flush every chunk so a streamed response reaches the client as it is produced
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _BrotliEncoder:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        return self._compressor.process(data) + (self._compressor.finish() if final else self._compressor.flush())
+
+
+# ✅ Server preference when the client accepts several at the same q-value
+ENCODERS = {"br": _BrotliEncoder, "gzip": _GzipEncoder} if brotli is not None else {"gzip": _GzipEncoder}
+
+
+def negotiate(accept_encoding: str):
+    """Picks the best encoding the client accepts, or None for identity."""
+    accepted = {}
+    for token in accept_encoding.split(","):
+        name, _, params = token.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                continue
+        accepted[name.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for name in ENCODERS:
+        quality = accepted.get(name, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware: gzip/brotli for compressible responses of ``minimum_size`` bytes or more.
+
+    Streamed responses are compressed chunk by chunk, so they stay streamed.
+    Responses that are already encoded, ranged, or bodiless pass through.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        start = None
+        encoder = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, encoder, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start = message  # held until the first body chunk shows how big the response is
+                return
+
+            if encoder is not None:
+                final = not message.get("more_body", False)
+                body = encoder.compress(message.get("body", b""), final)
+                if body or final:
+                    await send({"type": "http.response.body", "body": body, "more_body": not final})
+                return
+
+            headers = MutableHeaders(raw=start["headers"])
+            compressible = (
+                start["status"] not in (204, 206, 304)
+                and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+                and "content-encoding" not in headers
+                and "content-range" not in headers
+            )
+            if compressible:
+                headers.add_vary_header("Accept-Encoding")  # shared caches must keep the variants apart
+
+            body = message.get("body", b"")
+            streamed = message.get("more_body", False)
+            if (
+                message["type"] != "http.response.body"
+                or not compressible
+                or encoding is None
+                or (not streamed and len(body) < self.minimum_size)
+            ):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            encoder = ENCODERS[encoding]()
+            headers["content-encoding"] = encoding
+            if "content-length" in headers:
+                del headers["content-length"]
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["etag"] = f"W/{etag}"  # the encoded bytes differ from what a strong tag names
+            await send(start)
+            await send({"type": "http.response.body", "body": encoder.compress(body, not streamed), "more_body": streamed})
+
+        await self.app(scope, receive, send_wrapper)
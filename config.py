@@ -5,3 +5,105 @@ load_dotenv()
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your_default_secret_key")
 ALGORITHM = "HS256"
+
+# ✅ In-process catalog read cache
+CATALOG_CACHE_TTL_SECONDS = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "30"))
+CATALOG_CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "1024"))
+CATALOG_CACHE_MAX_BYTES = int(os.getenv("CATALOG_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# ✅ Signed tokens. JWT_KEYS is "kid:secret,kid:secret" (empty = SECRET_KEY alone); JWT_SIGNING_KID picks the
+# key new tokens are signed with (default: the first). Rotate by adding a key, then switching JWT_SIGNING_KID,
+# then dropping the old key once REFRESH_TOKEN_TTL_SECONDS have passed.
+JWT_KEYS = os.getenv("JWT_KEYS", "")
+JWT_SIGNING_KID = os.getenv("JWT_SIGNING_KID", "")
+ACCESS_TOKEN_TTL_SECONDS = int(os.getenv("ACCESS_TOKEN_TTL_SECONDS", "900"))
+REFRESH_TOKEN_TTL_SECONDS = int(os.getenv("REFRESH_TOKEN_TTL_SECONDS", str(30 * 24 * 3600)))
+TOKEN_REVOCATION_SYNC_SECONDS = float(os.getenv("TOKEN_REVOCATION_SYNC_SECONDS", "1"))  # how late another worker's revocations may apply
+
+# ✅ Authenticated-token cache (token -> verified claims, or the looked-up user for tokens issued before key ids)
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+
+# ✅ Database connection and pool settings
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./ecommerce.db")
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL", DATABASE_URL)  # point at a replica if there is one
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# ✅ SQLite connect-time PRAGMAs
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# ✅ Password hashing (bcrypt work factor and the worker pool that runs it)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))  # 0 = threadpool
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", "64"))
+
+# ✅ Image uploads
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "http://localhost:8080")
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+
+# ✅ Static /uploads caching (uploaded files never change once written)
+STATIC_MAX_AGE_SECONDS = int(os.getenv("STATIC_MAX_AGE_SECONDS", str(365 * 24 * 3600)))
+
+# ✅ Bulk catalog import/export
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "100"))  # row errors reported back, not a failure limit
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# ✅ Tag name -> id cache (tags are never renamed, so entries only age out)
+TAG_CACHE_TTL_SECONDS = float(os.getenv("TAG_CACHE_TTL_SECONDS", "3600"))
+TAG_CACHE_MAX_ENTRIES = int(os.getenv("TAG_CACHE_MAX_ENTRIES", "50000"))
+
+# ✅ Request metrics (/metrics) and the slow-query log
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+METRICS_SAMPLE_RATE = float(os.getenv("METRICS_SAMPLE_RATE", "0.1"))  # share of requests whose SQL is counted
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+
+# ✅ Idempotency-Key replay window for cart writes (per process)
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "100000"))
+MAX_CART_BATCH_ITEMS = int(os.getenv("MAX_CART_BATCH_ITEMS", "200"))
+
+# ✅ Background scan of saved items for price drops and restocks
+SAVED_ITEM_SCAN_INTERVAL_SECONDS = float(os.getenv("SAVED_ITEM_SCAN_INTERVAL_SECONDS", "60"))  # 0 = off
+SAVED_ITEM_SCAN_BATCH_SIZE = int(os.getenv("SAVED_ITEM_SCAN_BATCH_SIZE", "500"))
+SAVED_ITEM_SCAN_LAG_SECONDS = float(os.getenv("SAVED_ITEM_SCAN_LAG_SECONDS", "5"))  # let in-flight writes commit first
+
+# ✅ Schema changes are a deploy step (python migrations.py); workers only check that none are pending
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "false").lower() in ("1", "true", "yes")  # dev convenience
+
+# ✅ HTTP caching for catalog responses (ETag/Last-Modified come from the catalog version row)
+CATALOG_HTTP_MAX_AGE_SECONDS = int(os.getenv("CATALOG_HTTP_MAX_AGE_SECONDS", "10"))
+CATALOG_HTTP_STALE_SECONDS = int(os.getenv("CATALOG_HTTP_STALE_SECONDS", "30"))  # stale-while-revalidate
+CATALOG_VERSION_TTL_SECONDS = float(os.getenv("CATALOG_VERSION_TTL_SECONDS", "1"))  # how stale another worker's writes may look
+
+# ✅ Negotiated gzip/brotli for compressible responses at least this big
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))  # dynamic responses: fast settings beat the last few percent
+
+# ✅ Token-bucket rate limits per route, "<requests>/<seconds>" (bursts of up to <requests>)
+RATE_LIMITS_ENABLED = os.getenv("RATE_LIMITS_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_LOGIN_PER_IP = os.getenv("RATE_LIMIT_LOGIN_PER_IP", "30/60")
+RATE_LIMIT_LOGIN_PER_ACCOUNT = os.getenv("RATE_LIMIT_LOGIN_PER_ACCOUNT", "10/300")
+RATE_LIMIT_SIGNUP_PER_IP = os.getenv("RATE_LIMIT_SIGNUP_PER_IP", "10/3600")
+RATE_LIMIT_CART_WRITE_PER_USER = os.getenv("RATE_LIMIT_CART_WRITE_PER_USER", "120/60")
+RATE_LIMIT_CHECKOUT_PER_USER = os.getenv("RATE_LIMIT_CHECKOUT_PER_USER", "10/60")
+RATE_LIMIT_STORE_URL = os.getenv("RATE_LIMIT_STORE_URL", "")  # redis://... to share buckets across workers
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))  # per-process buckets kept
+
+# ✅ Admission control: write requests running at once, and how long an extra one may wait for a slot
+WRITE_MAX_CONCURRENCY = int(os.getenv("WRITE_MAX_CONCURRENCY", "32"))  # 0 = no cap
+WRITE_MAX_WAIT_SECONDS = float(os.getenv("WRITE_MAX_WAIT_SECONDS", "0.5"))
+
+# ✅ Cart stock holds: how long an add-to-cart keeps its units, and the sweeper that gives expired ones back
+CART_HOLD_TTL_SECONDS = float(os.getenv("CART_HOLD_TTL_SECONDS", "900"))
+STOCK_HOLD_SWEEP_INTERVAL_SECONDS = float(os.getenv("STOCK_HOLD_SWEEP_INTERVAL_SECONDS", "15"))  # 0 = off
+STOCK_HOLD_SWEEP_BATCH_SIZE = int(os.getenv("STOCK_HOLD_SWEEP_BATCH_SIZE", "500"))
@@ -1,27 +1,102 @@
+"""Creates a user from the command line - the one-off way to bootstrap an admin.
+
+    python create_user.py --email admin@example.com --first-name Admin --last-name User \\
+        --phone 1234567890 --admin
+
+The password is read from CREATE_USER_PASSWORD, or prompted for. With
+--if-missing an existing account is left untouched and the command still
+succeeds, so deploy scripts can run it on every release.
+
+--admin on an existing account promotes it instead, and --demote takes the
+rights away again; only --email is needed for either. The user's tokens are
+revoked, so the new role applies from their next login rather than whenever
+the old tokens run out.
+"""
+import argparse
+import getpass
+import os
+import sys
+
+from sqlalchemy import select
+
 from database import SessionLocal
+from dependencies import invalidate_user
 from models import User
-from passlib.context import CryptContext
+from passwords import pwd_context
+from tokens import revoke_user_tokens
+
+
+def create_user(db, email: str, password: str, first_name: str, last_name: str, phone_number: str, is_admin: bool = False) -> User:
+    user = User(
+        email=email,
+        password=pwd_context.hash(password),
+        first_name=first_name,
+        last_name=last_name,
+        phone_number=phone_number,
+        is_admin=is_admin,
+    )
+    db.add(user)
+    db.commit()
+    return user
+
+
+def set_admin(db, user: User, is_admin: bool):
+    """Grants or takes away admin rights and revokes the user's tokens, which still carry the old role."""
+    user.is_admin = is_admin
+    revoke_user_tokens(db, user.id)
+    db.commit()
+    invalidate_user(user.id)
+
+
+def _read_password() -> str:
+    password = os.getenv("CREATE_USER_PASSWORD")
+    if password:
+        return password
+    password = getpass.getpass("Password: ")
+    if password != getpass.getpass("Repeat password: "):
+        sys.exit("Passwords do not match")
+    return password
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--first-name")
+    parser.add_argument("--last-name")
+    parser.add_argument("--phone", help="phone number (must be unique)")
+    role = parser.add_mutually_exclusive_group()
+    role.add_argument("--admin", action="store_true", help="grant admin rights (promotes an existing account)")
+    role.add_argument("--demote", action="store_true", help="take admin rights away from an existing account")
+    parser.add_argument("--if-missing", action="store_true", help="exit successfully if the email is already registered")
+    args = parser.parse_args()
 
-# Password hashing setup
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    with SessionLocal() as db:
+        user = db.scalar(select(User).where(User.email == args.email))
+        if user is not None:
+            if args.if_missing:
+                print(f"✅ {args.email} already exists, nothing to do")
+                return
+            if not (args.admin or args.demote):
+                sys.exit(f"{args.email} is already registered")
+            if bool(user.is_admin) == args.admin:
+                print(f"✅ {args.email} {'is already' if args.admin else 'is not'} an admin, nothing to do")
+                return
+            set_admin(db, user, args.admin)
+            print(f"✅ {args.email} {'promoted to' if args.admin else 'is no longer an'} admin; their tokens were revoked")
+            return
+        if args.demote:
+            sys.exit(f"{args.email} is not registered")
 
-# Create a database session
-db = SessionLocal()
+        missing = [option for option, value in (("--first-name", args.first_name), ("--last-name", args.last_name), ("--phone", args.phone)) if value is None]
+        if missing:
+            parser.error(f"creating a user needs {', '.join(missing)}")
+        if db.scalar(select(User.id).where(User.phone_number == args.phone)) is not None:
+            sys.exit(f"Phone number {args.phone} is already registered")
 
-# Define the user details
-new_user = User(
-    email="user@example.com",
-    password=pwd_context.hash("secret"),  # Use "password" if your model uses that field
-    first_name="John",
-    last_name="Doe",
-    phone_number="123456789"
-)
+        create_user(db, args.email, _read_password(), args.first_name, args.last_name, args.phone, is_admin=args.admin)
 
-# Add and commit the new user
-db.add(new_user)
-db.commit()
+    print(f"✅ {'Admin' if args.admin else 'User'} created: {args.email}")
 
-# Close the database session
-db.close()
 
-print("User created successfully!")
+if __name__ == "__main__":
+    main()
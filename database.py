@@ -1,11 +1,136 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
 
-DATABASE_URL = "sqlite:///./ecommerce.db"
+from config import (
+    DATABASE_URL,
+    READ_DATABASE_URL,
+    DB_MAX_OVERFLOW,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_JOURNAL_MODE,
+    SQLITE_MMAP_SIZE,
+    SQLITE_SYNCHRONOUS,
+)
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+
+def _set_sqlite_pragmas(read_only: bool):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+    return on_connect
+
+
+def lock_sqlite_writer(connection):
+    """Takes SQLite's write lock for the rest of the transaction, if this connection does not hold it yet.
+
+    SQLite ignores FOR UPDATE, and pysqlite only opens a transaction at the
+    first write, so reads before it take no lock at all. Read-then-write
+    sequences that must not interleave (stock holds, checkout) call this
+    first; everything else keeps the deferred BEGIN, so a SELECT never
+    blocks other writers. No-op on other backends.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+    # A transaction already open on this connection has written, so it holds the lock
+    if not connection.connection.driver_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+# ✅ Backends whose insert() supports ON CONFLICT ... DO UPDATE ... RETURNING
+UPSERT_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+
+def upsert_insert(bind, table):
+    """The dialect's upsert-capable insert() for ``table``, or None if the backend has none."""
+    insert = UPSERT_INSERTS.get(bind.dialect.name)
+    return insert(table) if insert is not None else None
+
+
+# ✅ Async drivers used for each sync backend
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def _is_memory(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def _engine_options(url, queue_pool):
+    options = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    pool_options = {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW, "pool_timeout": DB_POOL_TIMEOUT}
+
+    if url.get_backend_name() != "sqlite":
+        options.update(pool_options)
+    elif _is_memory(url):
+        # One shared connection, otherwise each pooled connection opens its own empty database
+        options.update(connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    else:
+        options.update(
+            pool_options,
+            connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+            poolclass=queue_pool,
+        )
+    return options
+
+
+def create_db_engine(url: str, read_only: bool = False):
+    """Builds an engine with the configured pool; SQLite also gets WAL and friends."""
+    url = make_url(url)
+    engine = create_engine(url, **_engine_options(url, QueuePool))
+    if url.get_backend_name() == "sqlite":
+        event.listen(engine, "connect", _set_sqlite_pragmas(read_only))
+    return engine
+
+
+def create_async_db_engine(url: str, read_only: bool = False):
+    """AsyncEngine counterpart of create_db_engine, on the backend's async driver."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if not url.get_dialect().is_async and backend in ASYNC_DRIVERS:
+        url = url.set(drivername=ASYNC_DRIVERS[backend])
+
+    engine = create_async_engine(url, **_engine_options(url, AsyncAdaptedQueuePool))
+    if backend == "sqlite":
+        event.listen(engine.sync_engine, "connect", _set_sqlite_pragmas(read_only))
+    return engine
+
+
+engine = create_db_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# ✅ Separate pool for GET endpoints so reads never queue behind writers
+# (an in-memory database only exists on its one connection, so it cannot be split)
+_split_reads = not (READ_DATABASE_URL == DATABASE_URL and _is_memory(make_url(DATABASE_URL)))
+
+read_engine = create_db_engine(READ_DATABASE_URL, read_only=True) if _split_reads else engine
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# ✅ Async engines for handlers that must not block the event loop
+async_engine = create_async_db_engine(DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async_read_engine = create_async_db_engine(READ_DATABASE_URL, read_only=True) if _split_reads else async_engine
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 def get_db():
@@ -14,3 +139,18 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
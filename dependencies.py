@@ -1,17 +1,63 @@
+import time
+from dataclasses import dataclass
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from jwt import DecodeError, ExpiredSignatureError, decode
+from jwt import ExpiredSignatureError, InvalidTokenError
 
-from config import SECRET_KEY, ALGORITHM
-from database import get_db
+from cache import TTLCache
+from config import USER_CACHE_MAX_ENTRIES, USER_CACHE_TTL_SECONDS
+from database import get_read_db
 from models import User
+from tokens import ACCESS, RevokedTokenError, decode_token, revocations
 
 # Define OAuth2 scheme with the correct login endpoint
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """Extracts and validates the JWT token, returning the authenticated user."""
+
+@dataclass(frozen=True, slots=True)
+class CurrentUser:
+    """The authenticated user as most endpoints need it - no ORM instance attached."""
+    id: int
+    email: str
+    is_admin: bool
+
+
+# ✅ token -> (cached_at, CurrentUser) for tokens without a "uid" claim; entries never outlive the token itself
+user_cache = TTLCache(max_entries=USER_CACHE_MAX_ENTRIES, ttl=USER_CACHE_TTL_SECONDS)
+
+# user id -> monotonic time of the last invalidation; older cache entries are ignored
+_invalidated_at: dict[int, float] = {}
+
+
+def invalidate_user(user_id: int):
+    """Drops every cached snapshot of a user (account deletion, role changes) in this process.
+
+    Pair it with tokens.revoke_user_tokens, which reaches the other workers.
+    """
+    now = time.monotonic()
+    # An invalidation older than the cache TTL has nothing left to hide
+    for stale in [uid for uid, at in _invalidated_at.items() if at < now - USER_CACHE_TTL_SECONDS]:
+        _invalidated_at.pop(stale, None)
+    _invalidated_at[user_id] = now
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_read_db)) -> CurrentUser:
+    """Extracts and validates the JWT token, returning the authenticated user.
+
+    Current tokens carry the user's id and role, so this needs no query; only
+    tokens issued before that (email alone) are looked up.
+    """
+    cached = user_cache.get(token)
+    if cached is not None:
+        cached_at, current_user = cached
+        if cached_at > _invalidated_at.get(current_user.id, 0):
+            # ✅ Checked on every hit: logout and account deletion revoke these tokens through a per-user cut-off
+            if revocations.is_user_revoked(current_user.id):
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has been revoked")
+            return current_user
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid authentication credentials",
@@ -19,27 +65,52 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     )
 
     try:
-        payload = decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
+        payload = decode_token(token, ACCESS)
 
-        if email is None:
-            raise credentials_exception
+    except ExpiredSignatureError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has expired")
 
-        user = db.query(User).filter(User.email == email).first()
+    except RevokedTokenError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has been revoked")
 
-        if user is None:
-            raise credentials_exception
+    except InvalidTokenError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-        return user
+    if "uid" in payload:
+        return CurrentUser(id=payload["uid"], email=payload["sub"], is_admin=payload["adm"])
 
-    except ExpiredSignatureError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has expired")
+    email: str = payload.get("sub")
+    if email is None:
+        raise credentials_exception
 
-    except DecodeError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    # Taken before the lookup so a concurrent invalidation always wins
+    cached_at = time.monotonic()
+    row = db.query(User.id, User.email, User.is_admin).filter(User.email == email).first()
 
-def get_current_admin(current_user: User = Depends(get_current_user)):
+    if row is None:
+        raise credentials_exception
+    if revocations.is_user_revoked(row.id):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has been revoked")
+
+    current_user = CurrentUser(id=row.id, email=row.email, is_admin=bool(row.is_admin))
+
+    ttl = USER_CACHE_TTL_SECONDS
+    if "exp" in payload:
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        user_cache.set(token, (cached_at, current_user), ttl=ttl)
+
+    return current_user
+
+def get_current_admin(current_user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
     """Ensures that the current user is an admin."""
     if not current_user.is_admin:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
     return current_user
+
+def get_current_db_user(current_user: CurrentUser = Depends(get_current_user), db: Session = Depends(get_read_db)) -> User:
+    """Loads the full ORM user, for the few endpoints that need more than the snapshot."""
+    user = db.get(User, current_user.id)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid authentication credentials")
+    return user
@@ -0,0 +1,51 @@
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from starlette.datastructures import Headers
+from starlette.responses import Response
+
+from config import CATALOG_HTTP_MAX_AGE_SECONDS, CATALOG_HTTP_STALE_SECONDS
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    etag = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in header.split(","))
+
+
+def catalog_headers(catalog, private: bool = False) -> dict:
+    """Validators and Cache-Control for a response built from catalog version ``catalog``.
+
+    The ETag is weak: the same version may be sent compressed or not.
+    Public responses may be served by a shared cache for a few seconds;
+    private ones (admin views) must be revalidated every time.
+    """
+    headers = {"ETag": f'W/"c{catalog.version}"'}
+    if catalog.updated_at is not None:
+        headers["Last-Modified"] = format_datetime(catalog.updated_at.replace(tzinfo=timezone.utc), usegmt=True)
+    if private:
+        headers["Cache-Control"] = "private, no-cache"
+    else:
+        headers["Cache-Control"] = (
+            f"public, max-age={CATALOG_HTTP_MAX_AGE_SECONDS}, stale-while-revalidate={CATALOG_HTTP_STALE_SECONDS}"
+        )
+    return headers
+
+
+def not_modified(request_headers: Headers, headers: dict):
+    """A 304 for a conditional request that still matches ``headers``, or None."""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        matched = etag_matches(if_none_match, headers["ETag"])
+    else:
+        # If-Modified-Since only counts when there is no If-None-Match
+        if_modified_since = request_headers.get("if-modified-since")
+        if not if_modified_since or "Last-Modified" not in headers:
+            return None
+        try:
+            matched = parsedate_to_datetime(headers["Last-Modified"]) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return None
+    return Response(status_code=304, headers=headers) if matched else None
@@ -0,0 +1,60 @@
+import hashlib
+import threading
+
+from fastapi import HTTPException, status
+
+from cache import TTLCache
+from config import IDEMPOTENCY_MAX_ENTRIES, IDEMPOTENCY_TTL_SECONDS
+from responses import dumps
+
+_PENDING = object()
+
+
+class IdempotencyStore:
+    """Remembers the response to each (user, Idempotency-Key) so client retries replay it.
+
+    The first request with a key claims it; a retry with the same payload gets
+    the stored response, a retry with a different payload is rejected, and a
+    retry that arrives while the first is still running gets 409.
+
+    Entries live in this process only and are evicted by TTL and LRU, so a
+    retry that lands on another worker, or after eviction, runs again. Only
+    use it for writes that set absolute values (PUT /cart/items), where
+    running twice gives the same result; never for increments.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self._entries = TTLCache(max_entries=max_entries, ttl=ttl)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(payload) -> str:
+        return hashlib.sha256(dumps(payload)).hexdigest()
+
+    def claim(self, user_id: int, key: str, fingerprint: str):
+        """Returns a stored (status, body) to replay, or None after claiming the key for this request."""
+        with self._lock:
+            entry = self._entries.get((user_id, key))
+            if entry is None:
+                self._entries.set((user_id, key), (fingerprint, _PENDING))
+                return None
+        stored_fingerprint, response = entry
+        if stored_fingerprint != fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used for a different request"
+            )
+        if response is _PENDING:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A request with this Idempotency-Key is in progress")
+        return response
+
+    def complete(self, user_id: int, key: str, fingerprint: str, status_code: int, body: bytes):
+        self._entries.set((user_id, key), (fingerprint, (status_code, body)))
+
+    def release(self, user_id: int, key: str):
+        """Forgets a claim whose request failed, so the client can retry it for real."""
+        self._entries.pop((user_id, key))
+
+
+# ✅ Shared by every keyed cart write in this process
+idempotency_store = IdempotencyStore(max_entries=IDEMPOTENCY_MAX_ENTRIES, ttl=IDEMPOTENCY_TTL_SECONDS)
@@ -0,0 +1,129 @@
+import hashlib
+import os
+import re
+import tempfile
+
+from fastapi import HTTPException, UploadFile, status
+from starlette.concurrency import run_in_threadpool
+
+from config import MAX_UPLOAD_BYTES, PUBLIC_BASE_URL, UPLOAD_DIR
+
+try:  # Pillow is optional: without it uploads still work, just without resized variants
+    from PIL import Image
+except ImportError:
+    Image = None
+
+CHUNK_SIZE = 64 * 1024
+
+# ✅ Variant name -> longest edge in pixels; stored as <sha256>_<name>.webp
+IMAGE_VARIANTS = {"thumb": 320, "medium": 800}
+
+_CONTENT_HASH_NAME = re.compile(r"^[0-9a-f]{64}$")
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+def sniff_image_type(header: bytes):
+    """Returns the file extension for a JPEG/PNG/WebP header, or None."""
+    if header.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def _store_upload(source, upload_dir: str, max_bytes: int):
+    """Copies an upload to disk in chunks under its content hash.
+
+    Returns (filename, created); created is False when identical bytes were
+    already stored, in which case the new copy is discarded.
+    """
+    header = source.read(CHUNK_SIZE)
+    extension = sniff_image_type(header)
+    if extension is None:
+        raise ValueError("Invalid image format")
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=upload_dir, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            chunk = header
+            while chunk:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"Image exceeds {max_bytes} bytes")
+                digest.update(chunk)
+                buffer.write(chunk)
+                chunk = source.read(CHUNK_SIZE)
+
+        filename = f"{digest.hexdigest()}.{extension}"
+        final_path = os.path.join(upload_dir, filename)
+        if os.path.exists(final_path):
+            os.remove(temp_path)
+            return filename, False
+        os.replace(temp_path, final_path)
+        return filename, True
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _make_variants(path: str):
+    stem = os.path.splitext(path)[0]
+    with Image.open(path) as original:
+        original.load()
+        for name, edge in IMAGE_VARIANTS.items():
+            variant = original.copy()
+            variant.thumbnail((edge, edge))
+            if variant.mode not in ("RGB", "RGBA"):
+                variant = variant.convert("RGBA" if "transparency" in variant.info else "RGB")
+            variant.save(f"{stem}_{name}.webp", "WEBP", quality=80, method=4)
+
+
+def _remove_with_variants(filename: str):
+    stem = os.path.splitext(filename)[0]
+    for name in [filename, *(f"{stem}_{variant}.webp" for variant in IMAGE_VARIANTS)]:
+        path = os.path.join(UPLOAD_DIR, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+async def save_image(file: UploadFile) -> str:
+    """Stores an uploaded image (plus resized WebP variants) and returns its public URL."""
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Image is too large")
+
+    # Disk I/O and hashing run off the event loop
+    try:
+        filename, created = await run_in_threadpool(_store_upload, file.file, UPLOAD_DIR, MAX_UPLOAD_BYTES)
+    except UploadTooLarge:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Image is too large")
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid image format")
+
+    if created and Image is not None:
+        try:
+            await run_in_threadpool(_make_variants, os.path.join(UPLOAD_DIR, filename))
+        except Exception:
+            # Passed the signature check but Pillow cannot decode it - refuse it entirely
+            await run_in_threadpool(_remove_with_variants, filename)
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid image format")
+
+    return f"{PUBLIC_BASE_URL}/uploads/{filename}"
+
+
+def image_variant_urls(image_url) -> dict:
+    """Variant URLs for images stored by save_image; older uploads have none."""
+    if not image_url or Image is None:
+        return {}
+    base, _, filename = image_url.rpartition("/")
+    stem = filename.rpartition(".")[0]
+    if not _CONTENT_HASH_NAME.match(stem):
+        return {}
+    return {name: f"{base}/{stem}_{name}.webp" for name in IMAGE_VARIANTS}
@@ -0,0 +1,134 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from config import CART_HOLD_TTL_SECONDS
+from database import lock_sqlite_writer
+from models import Product, StockHold
+
+# ✅ What a new hold can still take: units in stock minus units other carts hold
+AVAILABLE = (Product.stock - Product.reserved).label("available")
+
+_products = Product.__table__
+_holds = StockHold.__table__
+
+# Adds b_delta (negative to release) to one product's reserved count. updated_at is pinned:
+# holds come and go constantly and are not catalog changes the saved-item scan should look at.
+ADJUST_RESERVED = (
+    update(_products)
+    .where(_products.c.id == bindparam("b_product_id"))
+    .values(reserved=_products.c.reserved + bindparam("b_delta"), updated_at=_products.c.updated_at)
+)
+
+_REFRESH_HOLD = (
+    update(_holds)
+    .where(_holds.c.user_id == bindparam("b_user_id"), _holds.c.product_id == bindparam("b_product_id"))
+    .values(quantity=bindparam("b_quantity"), expires_at=bindparam("b_expires_at"))
+)
+
+
+def lock_products(db: Session, product_ids):
+    """Locks product rows in id order and returns their (id, stock, reserved).
+
+    FOR UPDATE where the backend has it; on SQLite, which ignores it, the
+    transaction takes the database write lock instead (lock_sqlite_writer).
+
+    Everything that touches holds or reserved counts takes these locks first
+    and only then reads stock_holds, so it always sees holds as they are now
+    and concurrent writers queue in the same order instead of deadlocking.
+    """
+    lock_sqlite_writer(db.connection())
+    return db.execute(
+        select(Product.id, Product.stock, Product.reserved)
+        .where(Product.id.in_(sorted(product_ids)))
+        .order_by(Product.id)
+        .with_for_update()
+    ).all()
+
+
+def held_quantities(db: Session, user_id: int, product_ids) -> dict:
+    """product id -> units this user holds, for the given products."""
+    return dict(db.execute(
+        select(StockHold.product_id, StockHold.quantity)
+        .where(StockHold.user_id == user_id, StockHold.product_id.in_(list(product_ids)))
+    ).all())
+
+
+def set_holds(db: Session, user_id: int, quantities: dict, ttl: float = CART_HOLD_TTL_SECONDS) -> list:
+    """Makes the user's holds match ``quantities`` (product id -> units; 0 releases) for ``ttl`` more seconds.
+
+    Returns the product ids that do not have enough available; in that case
+    nothing is written. Runs inside the caller's transaction.
+    """
+    if not quantities:
+        return []
+    products = {row.id: row for row in lock_products(db, quantities)}
+    held = held_quantities(db, user_id, quantities)
+
+    short = [
+        product_id
+        for product_id, quantity in quantities.items()
+        if product_id not in products
+        or quantity - held.get(product_id, 0) > max(0, products[product_id].stock - products[product_id].reserved)
+    ]
+    if short:
+        return short
+
+    deltas = [
+        {"b_product_id": product_id, "b_delta": quantity - held.get(product_id, 0)}
+        for product_id, quantity in quantities.items()
+        if quantity != held.get(product_id, 0)
+    ]
+    if deltas:
+        db.execute(ADJUST_RESERVED, deltas)
+
+    released = [product_id for product_id, quantity in quantities.items() if quantity == 0 and product_id in held]
+    if released:
+        db.execute(delete(StockHold).where(StockHold.user_id == user_id, StockHold.product_id.in_(released)))
+
+    # ✅ Every remaining hold gets a fresh expiry; the locks above mean none can appear or vanish meanwhile
+    expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+    refreshed = [
+        {"b_user_id": user_id, "b_product_id": product_id, "b_quantity": quantity, "b_expires_at": expires_at}
+        for product_id, quantity in quantities.items()
+        if quantity > 0 and product_id in held
+    ]
+    if refreshed:
+        db.execute(_REFRESH_HOLD, refreshed)
+    created = [
+        {"user_id": user_id, "product_id": product_id, "quantity": quantity, "expires_at": expires_at}
+        for product_id, quantity in quantities.items()
+        if quantity > 0 and product_id not in held
+    ]
+    if created:
+        db.execute(insert(StockHold), created)
+    return []
+
+
+def release_holds(db: Session, user_id: int) -> int:
+    """Gives back every hold the user has (account deletion); returns the number released.
+
+    Holds are deleted by user rather than through their products, so one
+    whose product row is already gone is dropped too; reserved counts are
+    only adjusted for products that still exist.
+    """
+    product_ids = db.execute(select(StockHold.product_id).where(StockHold.user_id == user_id)).scalars().all()
+    if not product_ids:
+        return 0
+    existing = {row.id for row in lock_products(db, product_ids)}
+    released = db.execute(
+        delete(StockHold)
+        .where(StockHold.user_id == user_id)
+        .returning(StockHold.product_id, StockHold.quantity)
+        .execution_options(synchronize_session=False)
+    ).all()
+    deltas = [{"b_product_id": hold.product_id, "b_delta": -hold.quantity} for hold in released if hold.product_id in existing]
+    if deltas:
+        db.execute(ADJUST_RESERVED, deltas)
+    return len(released)
+
+
+def availability(db: Session, product_ids) -> dict:
+    """product id -> units a new cart hold could take right now."""
+    return {row.id: max(0, row.available) for row in db.execute(select(Product.id, AVAILABLE).where(Product.id.in_(list(product_ids))))}
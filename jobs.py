@@ -0,0 +1,204 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+
+from config import SAVED_ITEM_SCAN_BATCH_SIZE, SAVED_ITEM_SCAN_LAG_SECONDS, STOCK_HOLD_SWEEP_BATCH_SIZE
+from database import SessionLocal
+from inventory import ADJUST_RESERVED, lock_products
+from models import JobState, Product, SavedItem, SavedItemAlert, StockHold, TokenRevocation
+
+logger = logging.getLogger("jobs")
+
+SAVED_ITEM_CHANGES = "saved_item_changes"
+EPOCH = datetime(1970, 1, 1)
+
+
+# ---------------- SAVED ITEM CHANGE SCAN ----------------
+def scan_saved_item_changes(db, batch_size: int = SAVED_ITEM_SCAN_BATCH_SIZE, lag: float = SAVED_ITEM_SCAN_LAG_SECONDS) -> int:
+    """Checks one batch of recently changed products against the wishlists that hold them.
+
+    Products are read in (updated_at, id) order after the stored watermark, so
+    each run only looks at what changed since the last one. Rows younger than
+    ``lag`` seconds are left for the next run, because a transaction that is
+    still committing may carry an older timestamp. Returns the number of
+    products covered; 0 means the scan is caught up (or another worker took
+    this batch).
+    """
+    state = db.execute(select(JobState.watermark, JobState.last_id).where(JobState.name == SAVED_ITEM_CHANGES)).first()
+    watermark, last_id = state if state is not None else (EPOCH, 0)
+
+    products = db.execute(
+        select(Product.id, Product.price, Product.stock, Product.updated_at)
+        .where(
+            Product.updated_at <= datetime.utcnow() - timedelta(seconds=lag),
+            or_(Product.updated_at > watermark, and_(Product.updated_at == watermark, Product.id > last_id)),
+        )
+        .order_by(Product.updated_at, Product.id)
+        .limit(batch_size)
+    ).all()
+    if not products:
+        return 0
+
+    by_id = {product.id: product for product in products}
+    saved = db.execute(
+        select(SavedItem.id, SavedItem.user_id, SavedItem.product_id, SavedItem.last_price, SavedItem.last_stock)
+        .where(SavedItem.product_id.in_(list(by_id)))
+    ).all()
+
+    alerts, snapshots = [], []
+    for item in saved:
+        product = by_id[item.product_id]
+        if item.last_price is not None and product.price < item.last_price:
+            alerts.append({
+                "user_id": item.user_id,
+                "product_id": item.product_id,
+                "kind": "price_drop",
+                "old_price": item.last_price,
+                "new_price": product.price,
+            })
+        if item.last_stock is not None and item.last_stock <= 0 < product.stock:
+            alerts.append({
+                "user_id": item.user_id,
+                "product_id": item.product_id,
+                "kind": "restock",
+                "old_price": None,
+                "new_price": product.price,
+            })
+        if (item.last_price, item.last_stock) != (product.price, product.stock):
+            snapshots.append({"id": item.id, "last_price": product.price, "last_stock": product.stock})
+
+    try:
+        if alerts:
+            db.execute(insert(SavedItemAlert), alerts)
+        if snapshots:
+            db.execute(update(SavedItem), snapshots)  # bulk UPDATE by primary key
+
+        # ✅ Advance the watermark only if nobody else did: a concurrent worker's batch wins, ours rolls back
+        last = products[-1]
+        if state is None:
+            db.execute(insert(JobState).values(name=SAVED_ITEM_CHANGES, watermark=last.updated_at, last_id=last.id))
+        else:
+            claimed = db.execute(
+                update(JobState)
+                .where(JobState.name == SAVED_ITEM_CHANGES, JobState.watermark == watermark, JobState.last_id == last_id)
+                .values(watermark=last.updated_at, last_id=last.id)
+                .execution_options(synchronize_session=False)
+            )
+            if claimed.rowcount != 1:
+                db.rollback()
+                return 0
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return 0
+    except BaseException:
+        db.rollback()
+        raise
+
+    if alerts:
+        logger.info("Saved item scan: %d alerts from %d changed products", len(alerts), len(products))
+    return len(products)
+
+
+def run_saved_item_scan(session_factory=SessionLocal, batch_size: int = SAVED_ITEM_SCAN_BATCH_SIZE) -> int:
+    """Scans batch after batch until caught up; returns the number of products covered."""
+    total = 0
+    while True:
+        with session_factory() as db:
+            scanned = scan_saved_item_changes(db, batch_size)
+        total += scanned
+        if scanned < batch_size:
+            return total
+
+
+async def saved_item_scanner(interval: float):
+    """Background loop for the app: one catch-up scan every ``interval`` seconds, off the event loop."""
+    while True:
+        try:
+            await run_in_threadpool(run_saved_item_scan)
+        except Exception:
+            logger.exception("Saved item scan failed")
+        await asyncio.sleep(interval)
+
+
+# ---------------- STOCK HOLD EXPIRY ----------------
+def expire_stock_holds(db, batch_size: int = STOCK_HOLD_SWEEP_BATCH_SIZE) -> int:
+    """Releases one batch of expired cart holds, oldest first; returns how many were found.
+
+    Holds are picked without locks, then deleted once their products are
+    locked, re-checking the expiry: one that checkout converted or a cart
+    write renewed in between is left alone. Reserved counts drop by what the
+    DELETE actually returned, so nothing is released twice.
+    """
+    now = datetime.utcnow()
+    candidates = db.execute(
+        select(StockHold.id, StockHold.product_id)
+        .where(StockHold.expires_at <= now)
+        .order_by(StockHold.expires_at, StockHold.id)
+        .limit(batch_size)
+    ).all()
+    if not candidates:
+        return 0
+
+    try:
+        lock_products(db, {hold.product_id for hold in candidates})
+        expired = db.execute(
+            delete(StockHold)
+            .where(StockHold.id.in_([hold.id for hold in candidates]), StockHold.expires_at <= now)
+            .returning(StockHold.product_id, StockHold.quantity)
+            .execution_options(synchronize_session=False)
+        ).all()
+
+        released = {}
+        for hold in expired:
+            released[hold.product_id] = released.get(hold.product_id, 0) + hold.quantity
+        if released:
+            # ✅ One executemany for the whole batch's reserved counts
+            db.execute(ADJUST_RESERVED, [
+                {"b_product_id": product_id, "b_delta": -quantity} for product_id, quantity in released.items()
+            ])
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    return len(candidates)
+
+
+def run_stock_hold_sweep(session_factory=SessionLocal, batch_size: int = STOCK_HOLD_SWEEP_BATCH_SIZE) -> int:
+    """Sweeps batch after batch until no expired hold is left; returns the number of holds looked at."""
+    total = 0
+    while True:
+        with session_factory() as db:
+            swept = expire_stock_holds(db, batch_size)
+        total += swept
+        if swept < batch_size:
+            return total
+
+
+async def stock_hold_sweeper(interval: float):
+    """Background loop for the app: gives expired cart holds back every ``interval`` seconds, off the event loop."""
+    while True:
+        try:
+            await run_in_threadpool(run_stock_hold_sweep)
+        except Exception:
+            logger.exception("Stock hold sweep failed")
+        await asyncio.sleep(interval)
+
+
+# ---------------- TOKEN REVOCATION CLEANUP ----------------
+def prune_token_revocations(session_factory=SessionLocal) -> int:
+    """Deletes revocations whose tokens have all expired anyway; returns the number removed."""
+    with session_factory() as db:
+        removed = db.execute(delete(TokenRevocation).where(TokenRevocation.expires_at <= datetime.utcnow())).rowcount
+        db.commit()
+    return removed
+
+
+if __name__ == "__main__":
+    print(f"✅ Scanned {run_saved_item_scan()} changed products")
+    print(f"✅ Swept {run_stock_hold_sweep()} expired stock holds")
+    print(f"✅ Pruned {prune_token_revocations()} expired token revocations")
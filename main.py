@@ -1,76 +1,110 @@
-from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 import logging
 from auth import router as auth_router
 from admin import router as admin_router
 from cart import router as cart_router
+from orders import router as orders_router
 from products import router as products_router
-from database import engine
-from models import Base, User
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from saved import router as saved_router
+from database import async_engine, async_read_engine, engine, read_engine
+from config import (
+    METRICS_ENABLED,
+    MIGRATE_ON_STARTUP,
+    SAVED_ITEM_SCAN_INTERVAL_SECONDS,
+    STOCK_HOLD_SWEEP_INTERVAL_SECONDS,
+    UPLOAD_DIR,
+)
+from jobs import saved_item_scanner, stock_hold_sweeper
+from compression import CompressionMiddleware
+from metrics import MetricsMiddleware, instrument_engine, render_metrics
+from migrations import pending_migrations, run_migrations
+from passwords import password_pool
+from ratelimit import WriteAdmissionMiddleware
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
+from static import ImmutableStaticFiles
+from responses import FastJSONResponse
+import asyncio
 import os
 
+logging.basicConfig(level=logging.INFO)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-app = FastAPI()
+# ✅ Worker startup only reads: migrations and the admin account are one-off commands
+# (python migrations.py, python create_user.py --admin ...), not something every worker races to do
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if MIGRATE_ON_STARTUP:
+        await run_in_threadpool(run_migrations, engine)
+    else:
+        pending = await run_in_threadpool(pending_migrations, engine)
+        if pending:
+            raise RuntimeError(f"Database schema is out of date ({len(pending)} pending migrations): run `python migrations.py`")
 
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
-# ✅ Enable CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:5173", "http://localhost:8080"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    # ✅ Background jobs: price-drop/restock scanner for saved items, and expiry of cart stock holds
+    # (an interval of 0 turns either off, e.g. when a single dedicated process runs `python jobs.py`)
+    background = []
+    if SAVED_ITEM_SCAN_INTERVAL_SECONDS > 0:
+        background.append(asyncio.create_task(saved_item_scanner(SAVED_ITEM_SCAN_INTERVAL_SECONDS)))
+    if STOCK_HOLD_SWEEP_INTERVAL_SECONDS > 0:
+        background.append(asyncio.create_task(stock_hold_sweeper(STOCK_HOLD_SWEEP_INTERVAL_SECONDS)))
 
-# ✅ Ensure database tables are created
-Base.metadata.create_all(bind=engine)
+    try:
+        yield
+    finally:
+        for task in background:
+            task.cancel()
+        # ✅ Stop the password worker processes with the app
+        password_pool.shutdown()
 
-# ✅ Function to create a default admin (runs only once)
-def create_default_admin():
-    with Session(bind=engine) as db:
-        existing_admin = db.query(User).filter(User.email == "admin@example.com").first()
-        if not existing_admin:
-            default_admin = User(
-                email="admin@example.com",
-                password=pwd_context.hash("AdminPass123"),
-                first_name="Admin",
-                last_name="User",
-                phone_number="1234567890",
-                is_admin=True
-            )
-            db.add(default_admin)
-            db.commit()
-            print("✅ Default admin created: admin@example.com / AdminPass123")
 
-# ✅ Call this function on startup
-create_default_admin()
+def create_app() -> FastAPI:
+    # ✅ orjson-backed JSON for every route that doesn't build its own Response
+    app = FastAPI(default_response_class=FastJSONResponse, lifespan=lifespan)
 
-# ✅ Include all routers
-app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
-app.include_router(admin_router, prefix="/admin", tags=["Admin"])
-app.include_router(cart_router, prefix="/cart", tags=["Cart"])
-app.include_router(products_router, tags=["Products"]) 
+    # ✅ Uploaded files are write-once, so they are served with immutable caching
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    app.mount("/uploads", ImmutableStaticFiles(directory=UPLOAD_DIR), name="uploads")
+    # ✅ Enable CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:5173", "http://localhost:8080"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor"],
+    )
+    # ✅ gzip/brotli for JSON and text bodies above COMPRESSION_MIN_BYTES, streamed ones included
+    app.add_middleware(CompressionMiddleware)
+    # ✅ Sheds writes with 503 + Retry-After once WRITE_MAX_CONCURRENCY are already running
+    app.add_middleware(WriteAdmissionMiddleware)
 
-@app.get("/")
-def home():
-    return {"message": "Welcome to the e-commerce backend!"}
+    # ✅ Include all routers
+    app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
+    app.include_router(admin_router, prefix="/admin", tags=["Admin"])
+    app.include_router(cart_router, prefix="/cart", tags=["Cart"])
+    app.include_router(orders_router, prefix="/orders", tags=["Orders"])
+    app.include_router(saved_router, prefix="/saved", tags=["Saved Items"])
+    app.include_router(products_router, tags=["Products"])
 
-# ✅ Logging Middleware for Debugging
-logging.basicConfig(level=logging.INFO)
+    @app.get("/")
+    def home():
+        return {"message": "Welcome to the e-commerce backend!"}
+
+    # ✅ Latency histograms, in-flight count and sampled per-request SQL stats
+    if METRICS_ENABLED:
+        for instrumented in {engine, read_engine, async_engine.sync_engine, async_read_engine.sync_engine}:
+            instrument_engine(instrumented)
+        app.add_middleware(MetricsMiddleware)
+
+        @app.get("/metrics", include_in_schema=False)
+        def metrics():
+            return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    logging.info(f"Request: {request.method} {request.url}")
-    response = await call_next(request)
-    return response
- 
-UPLOAD_FOLDER = "uploads"
+    return app
 
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
 
+# `uvicorn main:app`, or `uvicorn main:create_app --factory`
+app = create_app()
@@ -0,0 +1,193 @@
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from config import METRICS_SAMPLE_RATE, SLOW_QUERY_MS
+
+slow_query_logger = logging.getLogger("sql.slow")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+# ---------------- METRIC TYPES ----------------
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help_text: str, label_names: tuple, buckets: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}  # labels -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            label_text = _labels(self.label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text}{"," if label_text else ""}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_text}{"," if label_text else ""}le="+Inf"}} {series[-2]}')
+            lines.append(f"{self.name}_count{{{label_text}}} {series[-2]}")
+            lines.append(f"{self.name}_sum{{{label_text}}} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help_text: str, kind: str = "gauge"):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def add(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def render(self) -> list:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}", f"{self.name} {self.value}"]
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    return ",".join(
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in zip(names, values)
+    )
+
+
+# ✅ Everything /metrics exposes
+request_latency = Histogram(
+    "http_request_duration_seconds", "Request latency by route.", ("method", "route", "status"), LATENCY_BUCKETS
+)
+request_statements = Histogram(
+    "http_request_db_statements", "SQL statements per sampled request.", ("route",), STATEMENT_BUCKETS
+)
+request_db_time = Histogram(
+    "http_request_db_duration_seconds", "Total SQL time per sampled request.", ("route",), LATENCY_BUCKETS
+)
+in_flight = Gauge("http_requests_in_flight", "Requests currently being served.")
+slow_queries = Gauge("db_slow_queries_total", f"Statements slower than {SLOW_QUERY_MS} ms.", kind="counter")
+
+METRICS = (request_latency, in_flight, request_statements, request_db_time, slow_queries)
+
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+
+# ---------------- SQL INSTRUMENTATION ----------------
+class QueryStats:
+    __slots__ = ("statements", "seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+
+
+# Set only for sampled requests; handlers in threads and greenlets inherit it
+current_query_stats: ContextVar = ContextVar("current_query_stats", default=None)
+
+
+def _redact(parameters, executemany: bool):
+    # Values can be emails, password hashes or tokens: log only their shape
+    if executemany:
+        return f"<{len(parameters)} parameter sets>"
+    if isinstance(parameters, dict):
+        return {name: "?" for name in parameters}
+    return ["?"] * len(parameters or ())
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_started
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.seconds += elapsed
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        slow_queries.add()
+        slow_query_logger.warning(
+            "%.1f ms: %s | params=%s", elapsed * 1000, " ".join(statement.split())[:1000], _redact(parameters, executemany)
+        )
+
+
+def instrument_engine(engine):
+    """Attaches the timing listeners to a sync Engine (pass ``async_engine.sync_engine`` for async ones)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ---------------- MIDDLEWARE ----------------
+class MetricsMiddleware:
+    """Pure ASGI middleware: per-route latency and in-flight for every request, SQL stats for a sample."""
+
+    def __init__(self, app, sample_rate: float = METRICS_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        root_path = scope.get("root_path", "")
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = QueryStats() if random.random() < self.sample_rate else None
+        token = current_query_stats.set(stats)
+        in_flight.add(1)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_flight.add(-1)
+            current_query_stats.reset(token)
+
+            route = _route_label(scope, root_path)
+            request_latency.observe((scope["method"], route, status_code), elapsed)
+            if stats is not None:
+                request_statements.observe((route,), stats.statements)
+                request_db_time.observe((route,), stats.seconds)
+
+
+def _route_label(scope, root_path: str) -> str:
+    # Route templates, never raw paths, so label cardinality stays bounded
+    route = scope.get("route")
+    if route is not None:
+        return route.path_format if hasattr(route, "path_format") else route.path
+    if scope.get("root_path", "") != root_path:
+        return scope["root_path"] + "/*"  # a Mount, e.g. /uploads
+    return "unmatched"
@@ -0,0 +1,242 @@
+import argparse
+import sys
+from datetime import datetime
+
+from sqlalchemy import MetaData, inspect, text
+from sqlalchemy.schema import CreateTable
+
+from database import engine
+from models import Base, Cart, Order, Product, SavedItem, StockHold, Tag, TokenRevocation, User, product_tags
+from search import rebuild_search_index
+
+# ✅ Bookkeeping table for applied schema changes
+CREATE_MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR NOT NULL,
+    applied_at DATETIME NOT NULL
+)
+"""
+
+
+def _create_indexes(conn, table, *names):
+    """Creates the named model indexes on an existing table (create_all skips existing tables)."""
+    indexes = {index.name: index for index in table.indexes}
+    for name in names:
+        indexes[name].create(conn, checkfirst=True)
+
+
+def _add_columns(conn, table, *names):
+    """Adds model columns missing from an existing table, as nullable columns (create_all skips existing tables)."""
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    for name in names:
+        if name not in existing:
+            column = table.c[name]
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(conn.dialect)}"))
+
+
+# ---------------- MIGRATIONS ----------------
+def _catalog_listing_indexes(conn):
+    _create_indexes(
+        conn,
+        Product.__table__,
+        "ix_products_category_price",
+        "ix_products_price",
+        "ix_products_stock",
+    )
+    _create_indexes(conn, product_tags, "ix_product_tags_tag_id")
+
+
+def _order_headers(conn):
+    """Splits legacy one-row-per-line orders into order headers plus order_items."""
+    columns = {column["name"] for column in inspect(conn).get_columns("orders")}
+    if "product_id" in columns:
+        # Each legacy row becomes a single-line order; there is no grouping to recover
+        scratch = MetaData()
+        User.__table__.to_metadata(scratch)  # lets the copied foreign key resolve
+        headers = Order.__table__.to_metadata(scratch, name="orders_new")
+        conn.execute(CreateTable(headers))
+        conn.execute(text(
+            "INSERT INTO orders_new (id, user_id, total_price, created_at) "
+            "SELECT id, user_id, total_price, created_at FROM orders"
+        ))
+        conn.execute(text(
+            "INSERT INTO order_items (order_id, product_id, quantity, unit_price, total_price) "
+            "SELECT id, product_id, quantity, total_price / quantity, total_price FROM orders"
+        ))
+        conn.execute(text("DROP TABLE orders"))
+        conn.execute(text("ALTER TABLE orders_new RENAME TO orders"))
+
+    _create_indexes(conn, Order.__table__, "ix_orders_id", "ix_orders_user_id_created_at")
+
+
+def _product_search_index(conn):
+    # FTS5 is SQLite-only; other backends fall back to LIKE matching in search.py
+    rebuild_search_index(conn)
+
+
+def _unique_tag_names(conn):
+    """Merges duplicate tags into the lowest id, then enforces unique names."""
+    conn.execute(text(
+        "CREATE TEMPORARY TABLE tag_merges AS "
+        "SELECT t.id AS old_id, k.keep_id AS new_id FROM tags t "
+        "JOIN (SELECT name, MIN(id) AS keep_id FROM tags GROUP BY name HAVING COUNT(*) > 1) k "
+        "ON k.name = t.name AND t.id <> k.keep_id"
+    ))
+    # Drop links the surviving tag already has, repoint the rest, then remove the duplicates
+    conn.execute(text(
+        "DELETE FROM product_tags WHERE EXISTS ("
+        "SELECT 1 FROM tag_merges m JOIN product_tags kept ON kept.tag_id = m.new_id "
+        "WHERE m.old_id = product_tags.tag_id AND kept.product_id = product_tags.product_id)"
+    ))
+    conn.execute(text(
+        "UPDATE product_tags SET tag_id = (SELECT new_id FROM tag_merges WHERE old_id = product_tags.tag_id) "
+        "WHERE tag_id IN (SELECT old_id FROM tag_merges)"
+    ))
+    conn.execute(text("DELETE FROM tags WHERE id IN (SELECT old_id FROM tag_merges)"))
+    conn.execute(text("DROP TABLE tag_merges"))
+
+    for index in inspect(conn).get_indexes("tags"):
+        if index["name"] == "ix_tags_name" and not index["unique"]:
+            conn.execute(text("DROP INDEX ix_tags_name"))
+    _create_indexes(conn, Tag.__table__, "ix_tags_name")
+
+
+def _unique_cart_items(conn):
+    """Folds duplicate (user, product) cart rows into the oldest one, then enforces uniqueness."""
+    conn.execute(text(
+        "UPDATE cart SET quantity = ("
+        "SELECT SUM(other.quantity) FROM cart other "
+        "WHERE other.user_id = cart.user_id AND other.product_id = cart.product_id) "
+        "WHERE id IN (SELECT MIN(id) FROM cart GROUP BY user_id, product_id HAVING COUNT(*) > 1)"
+    ))
+    conn.execute(text(
+        "DELETE FROM cart WHERE id NOT IN (SELECT MIN(id) FROM cart GROUP BY user_id, product_id)"
+    ))
+    _create_indexes(conn, Cart.__table__, "ix_cart_user_id_product_id")
+
+
+def _saved_items_tracking(conn):
+    """Product change timestamps, wishlist snapshots and one saved row per (user, product)."""
+    now = datetime.utcnow()
+    _add_columns(conn, Product.__table__, "updated_at")
+    conn.execute(text("UPDATE products SET updated_at = :now WHERE updated_at IS NULL"), {"now": now})
+    _create_indexes(conn, Product.__table__, "ix_products_updated_at")
+
+    _add_columns(conn, SavedItem.__table__, "created_at", "last_price", "last_stock")
+    conn.execute(text(
+        "DELETE FROM saved_items WHERE id NOT IN (SELECT MIN(id) FROM saved_items GROUP BY user_id, product_id)"
+    ))
+    conn.execute(text("UPDATE saved_items SET created_at = :now WHERE created_at IS NULL"), {"now": now})
+    conn.execute(text(
+        "UPDATE saved_items SET "
+        "last_price = (SELECT price FROM products WHERE products.id = saved_items.product_id), "
+        "last_stock = (SELECT stock FROM products WHERE products.id = saved_items.product_id) "
+        "WHERE last_price IS NULL"
+    ))
+    _create_indexes(conn, SavedItem.__table__, "ix_saved_items_user_id_product_id", "ix_saved_items_product_id")
+
+
+def _catalog_version(conn):
+    """Seeds the catalog version row read by conditional GETs on catalog endpoints."""
+    conn.execute(
+        text("INSERT INTO catalog_meta (id, version, updated_at) SELECT 1, 1, :now WHERE NOT EXISTS (SELECT 1 FROM catalog_meta WHERE id = 1)"),
+        {"now": datetime.utcnow()},
+    )
+
+
+def _token_revocations(conn):
+    """Revoked token ids and per-user cut-offs, mirrored into every worker's memory."""
+    TokenRevocation.__table__.create(conn, checkfirst=True)
+
+
+def _stock_holds(conn):
+    """Reserved-unit counts on products and the cart holds they add up."""
+    _add_columns(conn, Product.__table__, "reserved")
+    conn.execute(text("UPDATE products SET reserved = 0 WHERE reserved IS NULL"))
+    StockHold.__table__.create(conn, checkfirst=True)
+
+
+# (version, name, step) - append only, never renumber
+MIGRATIONS = [
+    (1, "catalog listing indexes", _catalog_listing_indexes),
+    (2, "order headers and line items", _order_headers),
+    (3, "product search index", _product_search_index),
+    (4, "unique tag names", _unique_tag_names),
+    (5, "unique cart items", _unique_cart_items),
+    (6, "saved items and product change tracking", _saved_items_tracking),
+    (7, "catalog version", _catalog_version),
+    (8, "token revocations", _token_revocations),
+    (9, "stock holds", _stock_holds),
+]
+
+
+def _lock(conn):
+    """Serializes concurrent migration runs: the second runner waits, then sees the first one's work."""
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('schema_migrations'))"))
+    elif conn.dialect.name == "sqlite":
+        # Any write statement takes SQLite's write lock for the rest of the transaction
+        conn.execute(text("UPDATE schema_migrations SET version = version WHERE 0"))
+
+
+def _applied_versions(conn) -> set:
+    if not inspect(conn).has_table("schema_migrations"):
+        return set()
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def pending_migrations(bind=engine) -> list:
+    """(version, name) of every migration not yet applied; read-only, cheap enough for app startup."""
+    with bind.connect() as conn:
+        applied = _applied_versions(conn)
+    return [(version, name) for version, name, _ in MIGRATIONS if version not in applied]
+
+
+def run_migrations(bind=engine) -> list:
+    """Creates missing tables, then applies every migration not yet recorded; returns the versions applied."""
+    Base.metadata.create_all(bind=bind)
+
+    applied_now = []
+    with bind.begin() as conn:
+        conn.execute(text(CREATE_MIGRATIONS_TABLE))
+        _lock(conn)
+        applied = _applied_versions(conn)
+
+        for version, name, step in MIGRATIONS:
+            if version in applied:
+                continue
+            step(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, :applied_at)"),
+                {"version": version, "name": name, "applied_at": datetime.utcnow()},
+            )
+            applied_now.append(version)
+    return applied_now
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Applies pending schema migrations (run once per deploy, before the app starts).")
+    parser.add_argument("--status", action="store_true", help="list pending migrations without applying them")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 if any migration is pending")
+    args = parser.parse_args()
+
+    if args.status or args.check:
+        pending = pending_migrations()
+        for version, name in pending:
+            print(f"pending: {version} {name}")
+        if not pending:
+            print("✅ Database schema is up to date")
+        if args.check and pending:
+            sys.exit(1)
+        return
+
+    applied = run_migrations()
+    for version, name, _ in MIGRATIONS:
+        if version in applied:
+            print(f"applied: {version} {name}")
+    print("✅ Database schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
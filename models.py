@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Float, Table, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, Float, Table, Boolean, DateTime, Index
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -8,7 +8,9 @@ product_tags = Table(
     "product_tags",
     Base.metadata,
     Column("product_id", Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True),
-    Column("tag_id", Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True)
+    Column("tag_id", Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True),
+    # ✅ Reverse lookup for tag filters (the primary key only covers product_id first)
+    Index("ix_product_tags_tag_id", "tag_id", "product_id")
 )
 
 class User(Base):
@@ -35,23 +37,33 @@ class Product(Base):
     description = Column(String, nullable=False)
     price = Column(Float, nullable=False)
     stock = Column(Integer, nullable=False)
+    reserved = Column(Integer, nullable=False, default=0)  # ✅ units held by carts (sum of stock_holds); available = stock - reserved
     category = Column(String, nullable=False)
     image_url = Column(String, nullable=True) 
     # tags = Column(String, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # ✅ change-scan watermark
 
     # ✅ Many-to-Many Relationship with Tags
     tags = relationship("Tag", secondary=product_tags, back_populates="products")
 
     # ✅ One-to-Many Relationship with Cart, Orders, and Saved Items
     cart_items = relationship("Cart", back_populates="product", cascade="all, delete-orphan")
-    orders = relationship("Order", back_populates="product", cascade="all, delete-orphan")
+    order_items = relationship("OrderItem", back_populates="product", cascade="all, delete-orphan")
     saved_items = relationship("SavedItem", back_populates="product", cascade="all, delete-orphan")  # ✅ Added saved items
 
+    # ✅ Indexes backing the catalog listing filters and keyset sort orders
+    __table_args__ = (
+        Index("ix_products_category_price", "category", "price", "id"),
+        Index("ix_products_price", "price", "id"),
+        Index("ix_products_stock", "stock"),
+        Index("ix_products_updated_at", "updated_at", "id"),
+    )
+
 class Tag(Base):
     __tablename__ = "tags"
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, nullable=False)
+    name = Column(String, nullable=False, unique=True, index=True)
     # product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"))
 
     products = relationship("Product", secondary=product_tags, back_populates="tags")
@@ -64,6 +76,11 @@ class Cart(Base):
     product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
     quantity = Column(Integer, nullable=False, default=1)
 
+    # ✅ One row per (user, product), so cart writes can be upserts
+    __table_args__ = (
+        Index("ix_cart_user_id_product_id", "user_id", "product_id", unique=True),
+    )
+
     # ✅ Proper relationships
     user = relationship("User", back_populates="cart_items")
     product = relationship("Product", back_populates="cart_items")
@@ -73,14 +90,31 @@ class Order(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
-    quantity = Column(Integer, nullable=False)
     total_price = Column(Float, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # ✅ Proper relationships
     user = relationship("User", back_populates="orders")
-    product = relationship("Product", back_populates="orders")
+    items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
+
+    # ✅ Order history is always read per user, newest first
+    __table_args__ = (
+        Index("ix_orders_user_id_created_at", "user_id", "created_at"),
+    )
+
+class OrderItem(Base):
+    __tablename__ = "order_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    unit_price = Column(Float, nullable=False)
+    total_price = Column(Float, nullable=False)
+
+    # ✅ Proper relationships
+    order = relationship("Order", back_populates="items")
+    product = relationship("Product", back_populates="order_items")
 
 class SavedItem(Base):
     __tablename__ = "saved_items"
@@ -88,7 +122,89 @@ class SavedItem(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # Price and stock as last seen by the change scanner (or at save time)
+    last_price = Column(Float, nullable=True)
+    last_stock = Column(Integer, nullable=True)
 
     # ✅ Relationship with User and Product
     user = relationship("User", back_populates="saved_items")
     product = relationship("Product", back_populates="saved_items")
+
+    # ✅ One row per (user, product); product_id alone drives the change scanner
+    __table_args__ = (
+        Index("ix_saved_items_user_id_product_id", "user_id", "product_id", unique=True),
+        Index("ix_saved_items_product_id", "product_id"),
+    )
+
+class SavedItemAlert(Base):
+    __tablename__ = "saved_item_alerts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    kind = Column(String, nullable=False)  # "price_drop" or "restock"
+    old_price = Column(Float, nullable=True)
+    new_price = Column(Float, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_saved_item_alerts_user_id_id", "user_id", "id"),
+    )
+
+class JobState(Base):
+    """Progress of incremental background jobs: everything up to (watermark, last_id) is done."""
+    __tablename__ = "job_state"
+
+    name = Column(String, primary_key=True)
+    watermark = Column(DateTime, nullable=False)
+    last_id = Column(Integer, nullable=False, default=0)
+
+class CatalogMeta(Base):
+    """Single row (id 1) whose version moves forward with every catalog or stock change."""
+    __tablename__ = "catalog_meta"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class TokenRevocation(Base):
+    """A revoked token (jti set), or every token of user_id issued up to revoked_at (jti NULL).
+
+    user_id is deliberately not a foreign key: the row has to outlive a deleted account.
+    """
+    __tablename__ = "token_revocations"
+
+    id = Column(Integer, primary_key=True)
+    jti = Column(String, nullable=True)
+    user_id = Column(Integer, nullable=True)
+    revoked_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)  # once every token it covers has expired, the row can go
+
+    __table_args__ = (
+        # ✅ Also makes a refresh token single-use: a second rotation of the same jti fails to insert
+        Index("ix_token_revocations_jti", "jti", unique=True),
+        Index("ix_token_revocations_revoked_at", "revoked_at"),
+        Index("ix_token_revocations_expires_at", "expires_at"),
+    )
+
+class StockHold(Base):
+    """Units of a product set aside for one user's cart until expires_at (one row per user and product).
+
+    Every change here moves Product.reserved by the same amount, in the same transaction.
+    """
+    __tablename__ = "stock_holds"
+
+    id = Column(Integer, primary_key=True)
+    # No ON DELETE CASCADE: holds have to be released through inventory.py, or reserved counts would leak
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_stock_holds_user_id_product_id", "user_id", "product_id", unique=True),
+        Index("ix_stock_holds_product_id", "product_id"),
+        # ✅ The sweeper reads expired holds oldest first
+        Index("ix_stock_holds_expires_at", "expires_at", "id"),
+    )
@@ -0,0 +1,53 @@
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session, selectinload
+
+from catalog import decode_cursor, pack_cursor
+from database import get_read_db
+from dependencies import CurrentUser, get_current_user
+from models import Order
+from schemas import OrderResponse
+
+router = APIRouter()
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+# ---------------- ORDER HISTORY ----------------
+@router.get("/", response_model=List[OrderResponse])
+def list_orders(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    # ✅ Newest first, keyset-paginated over the (user_id, created_at) index
+    query = (
+        select(Order)
+        .options(selectinload(Order.items))
+        .where(Order.user_id == current_user.id)
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        try:
+            created_at, last_id = decode_cursor(cursor)
+            created_at = datetime.fromisoformat(created_at)
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        query = query.where(or_(
+            Order.created_at < created_at,
+            and_(Order.created_at == created_at, Order.id < last_id),
+        ))
+
+    orders = db.execute(query).scalars().all()
+    if len(orders) > limit:
+        orders = orders[:limit]
+        response.headers["X-Next-Cursor"] = pack_cursor(orders[-1].created_at.isoformat(), orders[-1].id)
+
+    return orders
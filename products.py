@@ -1,34 +1,62 @@
-from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form
-from sqlalchemy.orm import Session
-from database import get_db
-from models import Product, Tag
+from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db, get_async_read_db
+from models import Product
+from cache import catalog_cache
+from images import image_variant_urls, save_image
+from catalog import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    build_listing_query,
+    build_page,
+    load_product_rows,
+    mark_catalog_changed,
+    read_catalog_version,
+    serialize_product,
+    split_page,
+)
+from http_cache import catalog_headers, not_modified
+from inventory import availability
+from responses import dumps
+from search import index_product, search_product_ids
+from tags import attach_tags, tag_facets
+from config import UPLOAD_DIR
 import os
-from uuid import uuid4
 from typing import Optional, List
 import json
-# from fastapi.staticfiles import StaticFiles
 
 router = APIRouter()
 
-UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-BASE_URL = "http://localhost:8080"
+
+async def _catalog_response(request: Request, db: AsyncSession, cache_key, build):
+    """Conditional GET and the page cache around ``build``, which returns (body bytes, extra headers).
+
+    Both hang off the catalog version, so a matching If-None-Match is
+    answered with 304 before any product row is read.
+    """
+    catalog = await db.run_sync(read_catalog_version)
+    headers = catalog_headers(catalog)
+    response = not_modified(request.headers, headers)
+    if response is not None:
+        return response
+
+    # ✅ Serve hot pages straight from the in-process cache
+    cached = catalog_cache.get_page(cache_key, catalog.version)
+    if cached is None:
+        cached = await build()
+        catalog_cache.set_page(cache_key, *cached, catalog.version)
+    body, extra_headers = cached
+    return Response(content=body, media_type="application/json", headers={**headers, **extra_headers})
 
 # ----------------- Image Upload Endpoint -----------------
 @router.post("/upload-image")
 async def upload_image(file: UploadFile = File(...)):
-    file_extension = file.filename.split(".")[-1].lower()
-    if file_extension not in ["jpg", "jpeg", "png", "webp"]:
-        raise HTTPException(status_code=400, detail="Invalid image format")
-
-    unique_filename = f"{uuid4()}.{file_extension}"
-    file_path = os.path.join(UPLOAD_DIR, unique_filename)
-
-    with open(file_path, "wb") as buffer:
-        buffer.write(await file.read())
+    # ✅ Streamed to disk, sniffed and stored under its content hash
+    image_url = await save_image(file)
 
-    return {"image_url": f"{BASE_URL}/uploads/{unique_filename}"}
+    return {"image_url": image_url, "image_variants": image_variant_urls(image_url)}
 
 # ----------------- Add Product Endpoint -----------------
 @router.post("/products")
@@ -40,11 +68,8 @@ async def add_product(
     category: str = Form(...),
     tags: Optional[str] = Form(None),  # JSON string list of tags
     image: Optional[UploadFile] = File(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    print(f"📩 Received Form Data: name={name}, price={price}, stock={stock}, description={description}, category={category}")
-    print(f"Tags: {tags}, Image: {image.filename if image else 'No Image'}")
-
     if not name or not description or not category:
         raise HTTPException(status_code=400, detail="All fields are required.")
 
@@ -61,19 +86,9 @@ async def add_product(
     # ✅ Process Image
     image_url = None
     if image:
-        file_extension = image.filename.split(".")[-1].lower()
-        if file_extension not in ["jpg", "jpeg", "png", "webp"]:
-            raise HTTPException(status_code=400, detail="Invalid image format")
-
-        unique_filename = f"{uuid4()}.{file_extension}"
-        file_path = os.path.join(UPLOAD_DIR, unique_filename)
-
-        with open(file_path, "wb") as buffer:
-            buffer.write(await image.read())
-
-        image_url = f"{BASE_URL}/uploads/{unique_filename}"
+        image_url = await save_image(image)
 
-    # ✅ Create Product
+    # ✅ Create Product together with its tags in one transaction
     new_product = Product(
         name=name,
         price=price,
@@ -82,42 +97,110 @@ async def add_product(
         category=category,
         image_url=image_url
     )
-    db.add(new_product)
-    db.commit()
-    db.refresh(new_product)
-
-    # ✅ Associate Tags with Product
-    for tag_name in tags_list:
-        tag = db.query(Tag).filter_by(name=tag_name).first()
-        if not tag:
-            tag = Tag(name=tag_name)
-            db.add(tag)
-            db.commit()
-            db.refresh(tag)
-        new_product.tags.append(tag)
 
-    db.commit()
-    db.refresh(new_product)
+    db.add(new_product)
+    await db.flush()
+    # ✅ Whole tag list resolved in one lookup plus at most one upsert
+    tag_names = await db.run_sync(attach_tags, new_product.id, tags_list)
+    await db.run_sync(index_product, new_product, tag_names)
+    await db.run_sync(mark_catalog_changed)
+    await db.commit()
 
-    return {"message": "Product added successfully", "product": new_product}
+    return {"message": "Product added successfully", "product": serialize_product(new_product, tag_names)}
 
 # ----------------- Get All Products Endpoint -----------------
 @router.get("/products")
-async def get_products(db: Session = Depends(get_db)):
-    products = db.query(Product).all()
-
-    product_list = []
-    for product in products:
-        product_list.append({
-            "id": product.id,
-            "name": product.name,
-            "price": product.price,
-            "stock": product.stock,
-            "description": product.description,
-            "category": product.category,
-            "image_url": product.image_url,
-            "tags": [tag.name for tag in product.tags]
-        })
-
-    return product_list
-
+async def get_products(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = "id",
+    category: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    in_stock: Optional[bool] = None,
+    tag: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    async def build():
+        # ✅ Keyset pagination: the next page starts after the last row of this one
+        try:
+            query = build_listing_query(
+                sort=sort,
+                cursor=cursor,
+                limit=limit,
+                category=category,
+                min_price=min_price,
+                max_price=max_price,
+                in_stock=in_stock,
+                tag=tag,
+            )
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+
+        rows, next_cursor = split_page((await db.execute(query)).all(), limit, sort)
+
+        # ✅ Plain row tuples into slotted DTOs, with one batched tag query for the page
+        body = dumps(await db.run_sync(build_page, rows))
+        return body, ({"X-Next-Cursor": next_cursor} if next_cursor else {})
+
+    cache_key = ("products", limit, cursor, sort, category, min_price, max_price, in_stock, tag)
+    return await _catalog_response(request, db, cache_key, build)
+
+# ----------------- Tag Facets Endpoint -----------------
+@router.get("/products/tags")
+async def get_tag_facets(
+    request: Request,
+    category: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    async def build():
+        # ✅ Per-tag product counts from one GROUP BY
+        return dumps(await db.run_sync(tag_facets, category, limit)), {}
+
+    return await _catalog_response(request, db, ("tag-facets", category, limit), build)
+
+# ----------------- Search Products Endpoint -----------------
+@router.get("/products/search")
+async def search_products(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[int] = Query(None, ge=0),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    async def build():
+        # ✅ Ranked by FTS5 bm25; the cursor is the offset of the next page
+        offset = cursor or 0
+        product_ids = await db.run_sync(search_product_ids, q, limit, offset)
+        headers = {"X-Next-Cursor": str(offset + limit)} if len(product_ids) > limit else {}
+
+        rows = await db.run_sync(load_product_rows, product_ids[:limit])
+        return dumps(await db.run_sync(build_page, rows)), headers
+
+    return await _catalog_response(request, db, ("search", q.strip().lower(), limit, cursor), build)
+
+# ----------------- Availability Endpoint -----------------
+# Stock minus what carts hold; changes with every cart write, so it stays out of the versioned catalog cache
+@router.get("/products/availability")
+async def get_availability(
+    response: Response,
+    ids: List[int] = Query(..., max_items=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    available = await db.run_sync(availability, ids)
+    response.headers["Cache-Control"] = "no-store"
+    return [{"product_id": product_id, "available": available[product_id]} for product_id in ids if product_id in available]
+
+# ----------------- Product Detail Endpoint -----------------
+# Declared after /products/search, /products/tags and /products/availability, which it would otherwise shadow
+@router.get("/products/{product_id}")
+async def get_product(product_id: int, request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    async def build():
+        rows = await db.run_sync(load_product_rows, [product_id])
+        if not rows:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return dumps((await db.run_sync(build_page, rows))[0]), {}
+
+    return await _catalog_response(request, db, ("product", product_id), build)
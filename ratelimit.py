@@ -0,0 +1,284 @@
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+from config import (
+    RATE_LIMIT_CART_WRITE_PER_USER,
+    RATE_LIMIT_CHECKOUT_PER_USER,
+    RATE_LIMIT_LOGIN_PER_ACCOUNT,
+    RATE_LIMIT_LOGIN_PER_IP,
+    RATE_LIMIT_MAX_KEYS,
+    RATE_LIMIT_SIGNUP_PER_IP,
+    RATE_LIMIT_STORE_URL,
+    RATE_LIMITS_ENABLED,
+    WRITE_MAX_CONCURRENCY,
+    WRITE_MAX_WAIT_SECONDS,
+)
+from dependencies import CurrentUser, get_current_user
+
+try:  # redis is optional: without it (or without RATE_LIMIT_STORE_URL) buckets live in each process
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger("ratelimit")
+
+
+# ---------------- RULES ----------------
+@dataclass(frozen=True, slots=True)
+class Rule:
+    """``limit`` requests per ``period`` seconds, refilled continuously; bursts of up to ``limit``."""
+    name: str
+    limit: int
+    period: float
+
+    @property
+    def rate(self) -> float:
+        return self.limit / self.period
+
+    @classmethod
+    def parse(cls, name: str, spec: str) -> "Rule":
+        """Reads "<limit>/<seconds>", e.g. "10/60" for ten requests a minute."""
+        limit, _, period = spec.partition("/")
+        return cls(name, int(limit), float(period or 1))
+
+
+# ---------------- STORES ----------------
+class MemoryBucketStore:
+    """Token buckets in this process, least recently used ones dropped beyond ``max_keys``."""
+
+    blocking = False
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: int) -> float:
+        """Takes one token; returns 0 if allowed, else the seconds until one is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+# Same bucket arithmetic as MemoryBucketStore, atomic on the server and timed by its clock
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or burst
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class SharedBucketStore:
+    """Buckets in a shared Redis, so every worker draws from the same ones.
+
+    If the shared store cannot be reached, ``fallback`` (a local store) stands
+    in, so limits keep applying per process instead of failing open or closed.
+    """
+
+    blocking = True  # network round trip: keep it off the event loop
+
+    def __init__(self, client, fallback: MemoryBucketStore, prefix: str = "ratelimit:"):
+        self.fallback = fallback
+        self.prefix = prefix
+        self.errors = 0
+        self._take = client.register_script(_TAKE_SCRIPT)
+
+    def take(self, key: str, rate: float, burst: int) -> float:
+        try:
+            return float(self._take(keys=[self.prefix + key], args=[rate, burst]))
+        except Exception:
+            if self.errors == 0:
+                logger.exception("Rate limit store unavailable, using per-process buckets")
+            self.errors += 1
+            return self.fallback.take(key, rate, burst)
+
+    def __len__(self):
+        return len(self.fallback)
+
+
+def build_store(url: str = RATE_LIMIT_STORE_URL):
+    local = MemoryBucketStore()
+    if url and redis is not None:
+        return SharedBucketStore(redis.Redis.from_url(url, socket_timeout=0.05), fallback=local)
+    if url:
+        logger.warning("RATE_LIMIT_STORE_URL is set but the redis package is missing; using per-process buckets")
+    return local
+
+
+# ---------------- LIMITER ----------------
+class RateLimiter:
+    def __init__(self, store, enabled: bool = RATE_LIMITS_ENABLED):
+        self.store = store
+        self.enabled = enabled
+        self.allowed = 0
+        self.limited = {}  # rule name -> rejections
+
+    async def check(self, rule: Rule, key):
+        """``hit`` for async code: in-memory buckets inline, a shared store from the threadpool."""
+        if self.store.blocking:
+            await run_in_threadpool(self.hit, rule, key)
+        else:
+            self.hit(rule, key)
+
+    def hit(self, rule: Rule, key):
+        """Counts one request against ``rule`` for ``key``; raises 429 with Retry-After when over the limit."""
+        if not self.enabled:
+            return
+        wait = self.store.take(f"{rule.name}:{key}", rule.rate, rule.limit)
+        if wait <= 0:
+            self.allowed += 1
+            return
+        self.limited[rule.name] = self.limited.get(rule.name, 0) + 1
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, please slow down",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))},
+        )
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "store": type(self.store).__name__,
+            "keys": len(self.store),
+            "allowed": self.allowed,
+            "limited": dict(self.limited),
+        }
+
+
+# ✅ Shared by every rate-limited route in this process
+limiter = RateLimiter(build_store())
+
+# ✅ Per-route rules, "<limit>/<seconds>" each (see config)
+LOGIN_PER_IP = Rule.parse("login-ip", RATE_LIMIT_LOGIN_PER_IP)
+LOGIN_PER_ACCOUNT = Rule.parse("login-account", RATE_LIMIT_LOGIN_PER_ACCOUNT)
+SIGNUP_PER_IP = Rule.parse("signup-ip", RATE_LIMIT_SIGNUP_PER_IP)
+CART_WRITE_PER_USER = Rule.parse("cart-write-user", RATE_LIMIT_CART_WRITE_PER_USER)
+CHECKOUT_PER_USER = Rule.parse("checkout-user", RATE_LIMIT_CHECKOUT_PER_USER)
+
+
+def client_ip(request: Request) -> str:
+    # Behind a proxy, run uvicorn with --proxy-headers so this is the real client
+    return request.client.host if request.client else "unknown"
+
+
+def limit_by_ip(rule: Rule):
+    """Route dependency: one bucket per client IP."""
+    async def dependency(request: Request):
+        await limiter.check(rule, client_ip(request))
+    return dependency
+
+
+def limit_by_user(rule: Rule):
+    """Route dependency: one bucket per authenticated user; returns that user."""
+    async def dependency(current_user: CurrentUser = Depends(get_current_user)) -> CurrentUser:
+        await limiter.check(rule, current_user.id)
+        return current_user
+    return dependency
+
+
+# ---------------- ADMISSION CONTROL ----------------
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class AdmissionControl:
+    """Caps how many write requests run at once.
+
+    Past ``max_concurrent``, a write waits up to ``max_wait`` seconds for a
+    slot and is then shed, so a burst turns into fast rejections instead of
+    every request queuing on the database writer until latency collapses.
+    """
+
+    def __init__(self, max_concurrent: int, max_wait: float):
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._semaphore = None  # created on first use, inside the server's event loop
+
+    async def acquire(self) -> bool:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.max_wait)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        self.admitted += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_wait": self.max_wait,
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+# ✅ One cap for all writes in this process (WRITE_MAX_CONCURRENCY=0 turns it off)
+write_admission = AdmissionControl(WRITE_MAX_CONCURRENCY, WRITE_MAX_WAIT_SECONDS)
+
+
+class WriteAdmissionMiddleware:
+    """Pure ASGI middleware: POST/PUT/PATCH/DELETE go through ``control``; rejected ones get 503 + Retry-After."""
+
+    def __init__(self, app, control: AdmissionControl = write_admission):
+        self.app = app
+        self.control = control
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS or self.control.max_concurrent <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        if not await self.control.acquire():
+            response = JSONResponse(
+                {"detail": "Server is busy, please retry"},
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.control.release()
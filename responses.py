@@ -0,0 +1,38 @@
+import json
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+try:  # orjson is optional: without it responses fall back to the stdlib encoder
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _slots_default(value):
+    # Slotted DTOs have no __dict__; orjson handles them natively as dataclasses
+    return {name: getattr(value, name) for name in value.__slots__}
+
+
+def dumps(value) -> bytes:
+    """Encodes ``value`` (dicts, lists, slotted DTOs) to JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, default=_slots_default, separators=(",", ":")).encode()
+
+
+def stream_json_array(pages):
+    """Joins already-encoded JSON arrays into one array, a page at a time, never holding more than one."""
+    yield b"["
+    first = True
+    for page in pages:
+        if len(page) <= 2:  # b"[]"
+            continue
+        if not first:
+            yield b","
+        yield page[1:-1]
+        first = False
+    yield b"]"
+
+
+# ✅ Default response class for the app
+FastJSONResponse = ORJSONResponse if orjson is not None else JSONResponse
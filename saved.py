@@ -0,0 +1,194 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from catalog import decode_cursor, pack_cursor
+from database import get_async_db, get_async_read_db, upsert_insert
+from dependencies import CurrentUser, get_current_user
+from inventory import set_holds
+from models import Cart, Product, SavedItem, SavedItemAlert
+from schemas import MoveToCartRequest, MoveToCartResponse, SavedItemAlertResponse, SavedItemResponse
+
+router = APIRouter()
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+# ---------------- HELPERS ----------------
+def _saved_query(user_id: int):
+    """Saved rows with the product columns the list needs, in one join."""
+    return (
+        select(
+            SavedItem.id,
+            SavedItem.product_id,
+            SavedItem.created_at,
+            SavedItem.last_price,
+            Product.name,
+            Product.price,
+            Product.stock,
+            Product.image_url,
+        )
+        .join(Product, SavedItem.product_id == Product.id)
+        .where(SavedItem.user_id == user_id)
+    )
+
+
+def _to_response(row) -> dict:
+    return SavedItemResponse(
+        id=row.id,
+        product_id=row.product_id,
+        product_name=row.name,
+        product_price=row.price,
+        stock=row.stock,
+        image_url=row.image_url,
+        saved_at=row.created_at,
+        saved_price=row.last_price,
+        price_dropped=row.last_price is not None and row.price < row.last_price,
+        in_stock=row.stock > 0,
+    ).dict()
+
+
+def _parse_cursor(cursor: Optional[str]) -> Optional[int]:
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor)[1]
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+async def _insert_ignoring_duplicates(db: AsyncSession, table, index_elements: list, rows: list):
+    """INSERT ... ON CONFLICT DO NOTHING, or row-by-row inserts where the backend has no upsert."""
+    statement = upsert_insert(db.bind, table)
+    if statement is not None:
+        await db.execute(statement.on_conflict_do_nothing(index_elements=index_elements), rows)
+        return
+
+    for row in rows:
+        try:
+            async with db.begin_nested():
+                await db.execute(insert(table).values(**row))
+        except IntegrityError:
+            pass  # already there
+
+
+# ---------------- MOVE TO CART ----------------
+# ✅ Declared before /{product_id} so the literal path wins
+@router.post("/move-to-cart", response_model=MoveToCartResponse)
+async def move_to_cart(
+    move: MoveToCartRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Moves saved items (all of them, or ``product_ids``) into the cart in one transaction.
+
+    Products already in the cart keep their quantity; products whose units
+    cannot be held (nothing left that other carts do not hold) stay saved.
+    """
+    query = select(SavedItem.product_id).where(SavedItem.user_id == current_user.id)
+    if move.product_ids is not None:
+        query = query.where(SavedItem.product_id.in_(move.product_ids))
+    product_ids = (await db.execute(query)).scalars().all()
+
+    in_cart = dict((await db.execute(
+        select(Cart.product_id, Cart.quantity).where(Cart.user_id == current_user.id, Cart.product_id.in_(product_ids))
+    )).all())
+    wanted = {product_id: in_cart.get(product_id, 1) for product_id in product_ids}
+    out_of_stock = await db.run_sync(set_holds, current_user.id, wanted)
+    if out_of_stock:
+        # set_holds wrote nothing; the rest fits, since the product rows stay locked until commit
+        wanted = {product_id: quantity for product_id, quantity in wanted.items() if product_id not in out_of_stock}
+        await db.run_sync(set_holds, current_user.id, wanted)
+
+    moved = list(wanted)
+    if moved:
+        await _insert_ignoring_duplicates(db, Cart, [Cart.user_id, Cart.product_id], [
+            {"user_id": current_user.id, "product_id": product_id, "quantity": 1}
+            for product_id in moved
+        ])
+        await db.execute(delete(SavedItem).where(SavedItem.user_id == current_user.id, SavedItem.product_id.in_(moved)))
+    await db.commit()
+
+    return {"moved": moved, "out_of_stock": out_of_stock}
+
+# ---------------- SAVE ITEM ----------------
+@router.post("/{product_id}", response_model=SavedItemResponse)
+async def save_item(product_id: int, db: AsyncSession = Depends(get_async_db), current_user: CurrentUser = Depends(get_current_user)):
+    product = (await db.execute(select(Product.price, Product.stock).where(Product.id == product_id))).first()
+    if not product:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+
+    # ✅ Saving twice is a no-op; the snapshot is what later price-drop/restock alerts compare against
+    await _insert_ignoring_duplicates(db, SavedItem, [SavedItem.user_id, SavedItem.product_id], [{
+        "user_id": current_user.id,
+        "product_id": product_id,
+        "last_price": product.price,
+        "last_stock": product.stock,
+    }])
+    await db.commit()
+
+    row = (await db.execute(_saved_query(current_user.id).where(SavedItem.product_id == product_id))).first()
+    return _to_response(row)
+
+# ---------------- LIST SAVED ITEMS ----------------
+@router.get("/", response_model=List[SavedItemResponse])
+async def list_saved_items(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    # ✅ Most recently saved first, keyset-paginated on the primary key
+    query = _saved_query(current_user.id).order_by(SavedItem.id.desc()).limit(limit + 1)
+    last_id = _parse_cursor(cursor)
+    if last_id is not None:
+        query = query.where(SavedItem.id < last_id)
+
+    rows = (await db.execute(query)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = pack_cursor(None, rows[-1].id)
+
+    return [_to_response(row) for row in rows]
+
+# ---------------- ALERTS ----------------
+@router.get("/alerts", response_model=List[SavedItemAlertResponse])
+async def list_saved_item_alerts(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Price drops and restocks on saved products, newest first (filled in by the change scanner in jobs.py)."""
+    query = (
+        select(SavedItemAlert)
+        .where(SavedItemAlert.user_id == current_user.id)
+        .order_by(SavedItemAlert.id.desc())
+        .limit(limit + 1)
+    )
+    last_id = _parse_cursor(cursor)
+    if last_id is not None:
+        query = query.where(SavedItemAlert.id < last_id)
+
+    alerts = (await db.execute(query)).scalars().all()
+    if len(alerts) > limit:
+        alerts = alerts[:limit]
+        response.headers["X-Next-Cursor"] = pack_cursor(None, alerts[-1].id)
+
+    return alerts
+
+# ---------------- REMOVE SAVED ITEM ----------------
+@router.delete("/{product_id}")
+async def remove_saved_item(product_id: int, db: AsyncSession = Depends(get_async_db), current_user: CurrentUser = Depends(get_current_user)):
+    result = await db.execute(delete(SavedItem).where(SavedItem.user_id == current_user.id, SavedItem.product_id == product_id))
+    if result.rowcount == 0:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Item not saved")
+    await db.commit()
+
+    return {"message": "Item removed from saved items"}
@@ -1,6 +1,8 @@
 from pydantic import BaseModel, EmailStr, validator
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
+from images import image_variant_urls
+from config import MAX_CART_BATCH_ITEMS
 
 # ✅ User Schemas
 class UserCreate(BaseModel):
@@ -28,7 +30,15 @@ class LoginRequest(BaseModel):
 
 class Token(BaseModel):
     access_token: str
+    refresh_token: str
     token_type: str
+    expires_in: int  # seconds the access token is valid for
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
 
 # ✅ Tag Schemas
 class TagResponse(BaseModel):
@@ -56,11 +66,16 @@ class ProductResponse(BaseModel):
     stock: int
     category: str
     image_url: Optional[str] = None
+    image_variants: Dict[str, str] = {}
     tags: Optional[List[str]] = []
 
     class Config:
         orm_mode = True
 
+    @validator('image_variants', always=True)
+    def derive_image_variants(cls, variants, values):
+        return variants or image_variant_urls(values.get("image_url"))
+
     @validator('tags', pre=True)
     def extract_tag_names(cls, tags):
         if isinstance(tags, list) and len(tags) > 0:
@@ -75,12 +90,60 @@ class CartItemCreate(BaseModel):
     product_id: int
     quantity: int
 
+class CartItemsUpdate(BaseModel):
+    items: List[CartItemCreate]
+
+    @validator('items')
+    def limit_batch(cls, items):
+        if len(items) > MAX_CART_BATCH_ITEMS:
+            raise ValueError(f"At most {MAX_CART_BATCH_ITEMS} items per request")
+        return items
+
 class CartItemResponse(BaseModel):
     id: int
     product_id: int
     product_name: str
     product_price: float
     quantity: int
+    held_quantity: Optional[int] = None  # units set aside for this cart (only listed by GET /cart)
+    held_until: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
+# ✅ Saved Item Schemas
+class SavedItemResponse(BaseModel):
+    id: int
+    product_id: int
+    product_name: str
+    product_price: float
+    stock: int
+    image_url: Optional[str] = None
+    saved_at: Optional[datetime] = None
+    saved_price: Optional[float] = None
+    price_dropped: bool = False
+    in_stock: bool = True
+
+class MoveToCartRequest(BaseModel):
+    product_ids: Optional[List[int]] = None  # None moves every saved item
+
+    @validator('product_ids')
+    def limit_batch(cls, product_ids):
+        if product_ids is not None and len(product_ids) > MAX_CART_BATCH_ITEMS:
+            raise ValueError(f"At most {MAX_CART_BATCH_ITEMS} items per request")
+        return product_ids
+
+class MoveToCartResponse(BaseModel):
+    moved: List[int]
+    out_of_stock: List[int]
+
+class SavedItemAlertResponse(BaseModel):
+    id: int
+    product_id: int
+    kind: str
+    old_price: Optional[float] = None
+    new_price: Optional[float] = None
+    created_at: datetime
 
     class Config:
         orm_mode = True
@@ -90,13 +153,21 @@ class OrderCreate(BaseModel):
     product_id: int
     quantity: int
 
+class OrderItemResponse(BaseModel):
+    product_id: int
+    quantity: int
+    unit_price: float
+    total_price: float
+
+    class Config:
+        orm_mode = True
+
 class OrderResponse(BaseModel):
     id: int
     user_id: int
-    product_id: int
-    quantity: int
     total_price: float
     created_at: datetime
+    items: List[OrderItemResponse] = []
 
     class Config:
         orm_mode = True
@@ -0,0 +1,181 @@
+import re
+
+from sqlalchemy import or_, select, text
+
+from models import Product, Tag, product_tags
+
+MAX_QUERY_TERMS = 8
+MAX_TYPO_CANDIDATES = 5
+
+# ✅ bm25 column weights: name, description, category, tags
+BM25_WEIGHTS = (10.0, 1.0, 3.0, 5.0)
+
+CREATE_SEARCH_TABLES = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, description, category, tags,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    # Term list of the index, used to find spelling corrections
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts_vocab USING fts5vocab(products_fts, 'row')",
+)
+
+REBUILD_SEARCH_INDEX = """
+INSERT INTO products_fts (rowid, name, description, category, tags)
+SELECT p.id, p.name, p.description, p.category, COALESCE((
+    SELECT group_concat(t.name, ' ')
+    FROM product_tags pt JOIN tags t ON t.id = pt.tag_id
+    WHERE pt.product_id = p.id
+), '')
+FROM products p
+"""
+
+_TERM = re.compile(r"\w+")
+
+
+def _uses_fts(bind) -> bool:
+    return bind.dialect.name == "sqlite"
+
+
+# ---------------- INDEX MAINTENANCE ----------------
+def rebuild_search_index(conn):
+    """Creates the FTS tables if needed and reloads them from the products table."""
+    if not _uses_fts(conn):
+        return
+    for statement in CREATE_SEARCH_TABLES:
+        conn.execute(text(statement))
+    conn.execute(text("DELETE FROM products_fts"))
+    conn.execute(text(REBUILD_SEARCH_INDEX))
+
+
+def index_product(db, product: Product, tag_names: list):
+    """(Re)indexes one product inside the caller's transaction; the product must be flushed."""
+    if not _uses_fts(db.get_bind()):
+        return
+    db.execute(text("DELETE FROM products_fts WHERE rowid = :id"), {"id": product.id})
+    index_products(db, [{
+        "id": product.id,
+        "name": product.name,
+        "description": product.description,
+        "category": product.category,
+        "tags": tag_names,
+    }])
+
+
+def index_products(db, products: list):
+    """Adds freshly inserted products, given as dicts with a ``tags`` name list, in one executemany."""
+    if not products or not _uses_fts(db.get_bind()):
+        return
+    db.execute(
+        text("INSERT INTO products_fts (rowid, name, description, category, tags) VALUES (:id, :name, :description, :category, :tags)"),
+        [
+            {
+                "id": product["id"],
+                "name": product["name"],
+                "description": product["description"] or "",
+                "category": product["category"] or "",
+                "tags": " ".join(product["tags"]),
+            }
+            for product in products
+        ],
+    )
+
+
+def unindex_product(db, product_id: int):
+    if _uses_fts(db.get_bind()):
+        db.execute(text("DELETE FROM products_fts WHERE rowid = :id"), {"id": product_id})
+
+
+# ---------------- QUERY PARSING ----------------
+def query_terms(q: str) -> list:
+    return list(dict.fromkeys(_TERM.findall(q.lower())))[:MAX_QUERY_TERMS]
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, giving up early (returns limit + 1) once it exceeds ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _max_typos(term: str) -> int:
+    if len(term) < 4:
+        return 0
+    return 1 if len(term) < 8 else 2
+
+
+def _typo_candidates(db, term: str) -> list:
+    """Indexed terms within a small edit distance of ``term`` that share its first letter."""
+    limit = _max_typos(term)
+    if not limit:
+        return []
+    rows = db.execute(
+        text(
+            "SELECT term, doc FROM products_fts_vocab "
+            "WHERE term >= :low AND term < :high AND length(term) BETWEEN :shortest AND :longest"
+        ),
+        {"low": term[0], "high": chr(ord(term[0]) + 1), "shortest": len(term) - limit, "longest": len(term) + limit},
+    )
+    scored = []
+    for candidate, doc_count in rows:
+        if candidate == term:
+            continue
+        distance = _edit_distance(term, candidate, limit)
+        if distance <= limit:
+            scored.append((distance, -doc_count, candidate))
+    return [candidate for _, _, candidate in sorted(scored)[:MAX_TYPO_CANDIDATES]]
+
+
+def build_match_query(db, terms: list) -> str:
+    """Every term must match, as a prefix or as one of its close spellings."""
+    clauses = []
+    for term in terms:
+        alternatives = [f'"{term}"*'] + [f'"{candidate}"' for candidate in _typo_candidates(db, term)]
+        clauses.append("(" + " OR ".join(alternatives) + ")")
+    return " AND ".join(clauses)
+
+
+# ---------------- SEARCH ----------------
+def search_product_ids(db, q: str, limit: int, offset: int) -> list:
+    """Ids of matching products, best match first; fetches ``limit + 1`` to detect a next page."""
+    terms = query_terms(q)
+    if not terms:
+        return []
+
+    if not _uses_fts(db.get_bind()):
+        # No FTS5 outside SQLite: substring match on the product columns, oldest first
+        query = select(Product.id)
+        for term in terms:
+            pattern = f"%{term}%"
+            query = query.where(or_(
+                Product.name.ilike(pattern),
+                Product.description.ilike(pattern),
+                Product.category.ilike(pattern),
+                Product.id.in_(
+                    select(product_tags.c.product_id)
+                    .join(Tag, Tag.id == product_tags.c.tag_id)
+                    .where(Tag.name.ilike(pattern))
+                ),
+            ))
+        return list(db.execute(query.order_by(Product.id).limit(limit + 1).offset(offset)).scalars())
+
+    weights = ", ".join(str(weight) for weight in BM25_WEIGHTS)
+    rows = db.execute(
+        text(
+            "SELECT rowid FROM products_fts WHERE products_fts MATCH :match "
+            f"ORDER BY bm25(products_fts, {weights}), rowid LIMIT :limit OFFSET :offset"
+        ),
+        {"match": build_match_query(db, terms), "limit": limit + 1, "offset": offset},
+    )
+    return [row[0] for row in rows]
+
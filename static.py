@@ -0,0 +1,174 @@
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from mimetypes import guess_type
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+
+from config import STATIC_MAX_AGE_SECONDS
+from http_cache import etag_matches
+
+CHUNK_SIZE = 256 * 1024
+
+_CONTENT_HASH_NAME = re.compile(r"^[0-9a-f]{64}$")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# ✅ Precompressed siblings we look for, in order of preference
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "image/svg+xml")
+
+
+def _strong_etag(path: str, stat_result: os.stat_result) -> str:
+    # Content-hash names already identify the bytes; anything else is keyed by size + mtime
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if _CONTENT_HASH_NAME.match(stem):
+        return f'"{stem}"'
+    return f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+
+
+def _parse_range(header: str, size: int):
+    """Returns (start, end_exclusive), None to ignore the header, or "unsatisfiable"."""
+    match = _RANGE.match(header.strip())
+    if not match:
+        return None  # malformed or multi-range: serving the full file is allowed
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            return "unsatisfiable"
+        return max(0, size - length), size
+    start = int(first)
+    end = min(int(last) + 1, size) if last else size
+    if start >= size or start >= end:
+        return "unsatisfiable"
+    return start, end
+
+
+class ImmutableFileResponse(Response):
+    """File response for content that never changes once written.
+
+    Sends a strong ETag and ``Cache-Control: immutable``, answers
+    conditional requests with 304, serves single byte ranges, and hands the
+    file to the server via the ASGI zero-copy/pathsend extensions when the
+    server supports them.
+    """
+
+    def __init__(self, path: str, stat_result: os.stat_result, request_headers: Headers):
+        self.path = path
+        self.offset, self.count = 0, stat_result.st_size
+        self.status_code = 200
+        self.background = None
+
+        media_type = guess_type(path)[0] or "application/octet-stream"
+        etag = _strong_etag(path, stat_result)
+        headers = {
+            "etag": etag,
+            "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+            "cache-control": f"public, max-age={STATIC_MAX_AGE_SECONDS}, immutable",
+            "accept-ranges": "bytes",
+            "content-type": media_type,
+        }
+
+        if self._not_modified(request_headers, etag, stat_result):
+            self.status_code, self.count = 304, 0
+            headers.pop("content-type")
+            self.init_headers(headers)
+            return
+
+        compressible = media_type.startswith(COMPRESSIBLE_TYPES)
+        if compressible:
+            headers["vary"] = "Accept-Encoding"
+            encoding = self._precompressed_variant(request_headers)
+            if encoding is not None:
+                headers["content-encoding"], self.path, compressed_size = encoding
+                headers["accept-ranges"] = "none"
+                self.count = compressed_size
+
+        range_header = request_headers.get("range")
+        if range_header and "content-encoding" not in headers and self._if_range_allows(request_headers, etag):
+            byte_range = _parse_range(range_header, stat_result.st_size)
+            if byte_range == "unsatisfiable":
+                self.status_code, self.count = 416, 0
+                headers["content-range"] = f"bytes */{stat_result.st_size}"
+            elif byte_range is not None:
+                start, end = byte_range
+                self.status_code, self.offset, self.count = 206, start, end - start
+                headers["content-range"] = f"bytes {start}-{end - 1}/{stat_result.st_size}"
+
+        headers["content-length"] = str(self.count)
+        self.init_headers(headers)
+
+    @staticmethod
+    def _not_modified(request_headers: Headers, etag: str, stat_result: os.stat_result) -> bool:
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            return etag_matches(if_none_match, etag)
+        if_modified_since = request_headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return int(stat_result.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    @staticmethod
+    def _if_range_allows(request_headers: Headers, etag: str) -> bool:
+        if_range = request_headers.get("if-range")
+        return if_range is None or if_range.strip() == etag
+
+    def _precompressed_variant(self, request_headers: Headers):
+        accepted = {token.split(";")[0].strip() for token in request_headers.get("accept-encoding", "").split(",")}
+        for encoding, suffix in PRECOMPRESSED:
+            if encoding in accepted:
+                try:
+                    return encoding, self.path + suffix, os.stat(self.path + suffix).st_size
+                except OSError:
+                    continue
+        return None
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+
+        if scope["method"] == "HEAD" or self.count == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        extensions = scope.get("extensions") or {}
+        if "http.response.zerocopysend" in extensions:
+            file = await anyio.to_thread.run_sync(open, self.path, "rb")
+            try:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file.fileno(),
+                    "offset": self.offset,
+                    "count": self.count,
+                    "more_body": False,
+                })
+            finally:
+                await anyio.to_thread.run_sync(file.close)
+        elif "http.response.pathsend" in extensions and self.status_code == 200:
+            await send({"type": "http.response.pathsend", "path": os.path.abspath(self.path)})
+        else:
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                await file.seek(self.offset)
+                remaining = self.count
+                while remaining > 0:
+                    chunk = await file.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+                if remaining > 0:
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """StaticFiles for write-once uploads: long-lived caching, 304s, ranges and zero-copy."""
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        return ImmutableFileResponse(str(full_path), stat_result, Headers(scope=scope))
@@ -0,0 +1,82 @@
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects import mysql
+
+from cache import TTLCache
+from config import TAG_CACHE_MAX_ENTRIES, TAG_CACHE_TTL_SECONDS
+from database import upsert_insert
+from models import Product, Tag, product_tags
+
+# ✅ Tag name -> id, shared by every writer in this process
+tag_cache = TTLCache(max_entries=TAG_CACHE_MAX_ENTRIES, ttl=TAG_CACHE_TTL_SECONDS)
+
+
+def _upsert_tags(db, names: list) -> dict:
+    """Inserts tags that may have been created concurrently and returns ids for all of ``names``."""
+    bind = db.get_bind()
+    rows = [{"name": name} for name in names]
+
+    statement = upsert_insert(bind, Tag)
+    if statement is not None:
+        # A no-op DO UPDATE, unlike DO NOTHING, still returns the id of a row that already exists
+        statement = statement.on_conflict_do_update(index_elements=[Tag.name], set_={"name": statement.excluded.name})
+        return dict(db.execute(statement.returning(Tag.name, Tag.id), rows).all())
+
+    if bind.dialect.name == "mysql":
+        db.execute(mysql.insert(Tag).prefix_with("IGNORE"), rows)
+    else:
+        db.execute(insert(Tag), rows)
+    return dict(db.execute(select(Tag.name, Tag.id).where(Tag.name.in_(names))).all())
+
+
+def resolve_tag_ids(db, names) -> dict:
+    """Maps tag names to ids, creating missing tags in the caller's transaction.
+
+    Uncached names cost one ``IN`` lookup, and any that are still missing are
+    created by one conflict-tolerant upsert. Only ids that were already
+    committed are cached; ids created here could still be rolled back.
+    """
+    names = list(dict.fromkeys(name for name in names if name))
+    tag_ids = {}
+    unknown = []
+    for name in names:
+        tag_id = tag_cache.get(name)
+        if tag_id is None:
+            unknown.append(name)
+        else:
+            tag_ids[name] = tag_id
+    if not unknown:
+        return tag_ids
+
+    existing = dict(db.execute(select(Tag.name, Tag.id).where(Tag.name.in_(unknown))).all())
+    for name, tag_id in existing.items():
+        tag_cache.set(name, tag_id)
+    tag_ids.update(existing)
+
+    missing = [name for name in unknown if name not in existing]
+    if missing:
+        tag_ids.update(_upsert_tags(db, missing))
+    return tag_ids
+
+
+def attach_tags(db, product_id: int, names) -> list:
+    """Links a flushed product to its tags, creating missing ones; returns the de-duplicated names."""
+    names = list(dict.fromkeys(name for name in names if name))
+    tag_ids = resolve_tag_ids(db, names)
+    if names:
+        db.execute(insert(product_tags), [{"product_id": product_id, "tag_id": tag_ids[name]} for name in names])
+    return names
+
+
+def tag_facets(db, category=None, limit: int = 100) -> list:
+    """Tags with their product counts, most used first, in one aggregated query."""
+    count = func.count(product_tags.c.product_id).label("count")
+    query = (
+        select(Tag.name, count)
+        .join(product_tags, product_tags.c.tag_id == Tag.id)
+        .group_by(Tag.id, Tag.name)
+        .order_by(count.desc(), Tag.name)
+        .limit(limit)
+    )
+    if category is not None:
+        query = query.join(Product, Product.id == product_tags.c.product_id).where(Product.category == category)
+    return [{"name": name, "count": count} for name, count in db.execute(query)]
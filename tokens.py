@@ -0,0 +1,246 @@
+import logging
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+
+from jwt import InvalidTokenError, decode, encode, get_unverified_header
+from sqlalchemy import event, insert, select
+from sqlalchemy.orm import Session
+
+from cache import TTLCache
+from config import (
+    ACCESS_TOKEN_TTL_SECONDS,
+    ALGORITHM,
+    JWT_KEYS,
+    JWT_SIGNING_KID,
+    REFRESH_TOKEN_TTL_SECONDS,
+    SECRET_KEY,
+    TOKEN_REVOCATION_SYNC_SECONDS,
+    USER_CACHE_MAX_ENTRIES,
+    USER_CACHE_TTL_SECONDS,
+)
+from database import ReadSessionLocal
+from models import TokenRevocation
+
+ACCESS = "access"
+REFRESH = "refresh"
+EPOCH = datetime(1970, 1, 1)
+
+logger = logging.getLogger("tokens")
+
+
+class RevokedTokenError(InvalidTokenError):
+    pass
+
+
+# ---------------- KEYS ----------------
+def parse_keys(spec: str) -> dict:
+    """Reads "kid:secret,kid:secret" into {kid: secret}."""
+    keys = {}
+    for item in spec.split(","):
+        kid, _, secret = item.strip().partition(":")
+        if kid and secret:
+            keys[kid] = secret
+    return keys
+
+
+# ✅ Every key listed verifies; only SIGNING_KID signs, so keys can be rotated without logging anyone out
+SIGNING_KEYS = parse_keys(JWT_KEYS) or {"default": SECRET_KEY}
+SIGNING_KID = JWT_SIGNING_KID or next(iter(SIGNING_KEYS))
+if SIGNING_KID not in SIGNING_KEYS:
+    raise RuntimeError(f"JWT_SIGNING_KID {SIGNING_KID!r} is not one of JWT_KEYS")
+
+
+# ---------------- ISSUING ----------------
+def _sign(claims: dict) -> str:
+    return encode(claims, SIGNING_KEYS[SIGNING_KID], algorithm=ALGORITHM, headers={"kid": SIGNING_KID})
+
+
+def issue_tokens(user_id: int, email: str, is_admin: bool) -> dict:
+    """A short-lived access token carrying everything get_current_user needs, plus a refresh token."""
+    # iat keeps its fraction: per-user cut-offs are compared to it, and a login in the same second must survive one
+    issued_at = time.time()
+    now = int(issued_at)
+    access_token = _sign({
+        "sub": email,
+        "uid": user_id,
+        "adm": bool(is_admin),
+        "typ": ACCESS,
+        "jti": secrets.token_urlsafe(16),
+        "iat": issued_at,
+        "exp": now + ACCESS_TOKEN_TTL_SECONDS,
+    })
+    refresh_token = _sign({
+        "sub": email,
+        "uid": user_id,
+        "typ": REFRESH,
+        "jti": secrets.token_urlsafe(16),
+        "iat": issued_at,
+        "exp": now + REFRESH_TOKEN_TTL_SECONDS,
+    })
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_TTL_SECONDS,
+    }
+
+
+# ---------------- REVOCATION ----------------
+class RevocationList:
+    """This process's copy of token_revocations: revoked jtis and per-user cut-offs, O(1) to check.
+
+    Revocations made here apply on commit; other workers' are picked up by
+    ``sync``, at most ``sync_interval`` seconds late. Each sync only reads
+    rows revoked since the previous one (with an overlap for transactions
+    that were still committing), so its cost does not grow with the table.
+    Syncs read through the read engine, never taking a writer's lock; the
+    overlap also absorbs a replica that lags by less than that.
+    """
+
+    # Rows can commit (or reach a replica) a little after their revoked_at, and worker clocks drift
+    overlap = timedelta(seconds=30)
+
+    def __init__(self, sync_interval: float = TOKEN_REVOCATION_SYNC_SECONDS):
+        self.sync_interval = sync_interval
+        self._jtis = {}  # jti -> expiry (epoch seconds)
+        self._users = {}  # user id -> tokens issued at or before this (epoch seconds) are revoked
+        self._synced_from = EPOCH
+        self._synced_at = float("-inf")
+        self._sync_lock = threading.Lock()
+        self.syncs = 0
+
+    def add(self, jti, user_id, revoked_at: float, expires_at: float):
+        if jti is not None:
+            self._jtis[jti] = expires_at
+        elif user_id is not None and revoked_at > self._users.get(user_id, float("-inf")):
+            self._users[user_id] = revoked_at
+
+    def is_revoked(self, claims: dict) -> bool:
+        if time.monotonic() - self._synced_at >= self.sync_interval:
+            self.sync()
+        return claims["jti"] in self._jtis or claims["iat"] <= self._users.get(claims["uid"], float("-inf"))
+
+    def is_user_revoked(self, user_id: int) -> bool:
+        """For tokens from before key ids, which carry neither jti nor iat.
+
+        Every one of them was issued before any per-user cut-off existed, so
+        a cut-off for the user revokes them all.
+        """
+        if time.monotonic() - self._synced_at >= self.sync_interval:
+            self.sync()
+        return user_id in self._users
+
+    def sync(self, session_factory=ReadSessionLocal):
+        # One thread syncs; the others carry on with the copy they have
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            started = datetime.utcnow()
+            try:
+                with session_factory() as db:
+                    rows = db.execute(
+                        select(TokenRevocation.jti, TokenRevocation.user_id, TokenRevocation.revoked_at, TokenRevocation.expires_at)
+                        .where(TokenRevocation.revoked_at > self._synced_from - self.overlap)
+                    ).all()
+            except Exception:
+                # Keep verifying against the copy we have; the next interval retries from the same point
+                logger.exception("Token revocation sync failed")
+                self._synced_at = time.monotonic()
+                return
+            for row in rows:
+                self.add(row.jti, row.user_id, _epoch(row.revoked_at), _epoch(row.expires_at))
+            self._prune()
+            self._synced_from = started
+            self._synced_at = time.monotonic()
+            self.syncs += 1
+        finally:
+            self._sync_lock.release()
+
+    def _prune(self):
+        now = time.time()
+        for jti in [jti for jti, expires_at in self._jtis.items() if expires_at <= now]:
+            self._jtis.pop(jti, None)
+        oldest_live = now - max(ACCESS_TOKEN_TTL_SECONDS, REFRESH_TOKEN_TTL_SECONDS)
+        for user_id in [user_id for user_id, revoked_at in self._users.items() if revoked_at < oldest_live]:
+            self._users.pop(user_id, None)
+
+    def stats(self) -> dict:
+        return {"jtis": len(self._jtis), "users": len(self._users), "syncs": self.syncs}
+
+
+def _epoch(value: datetime) -> float:
+    return (value - EPOCH).total_seconds()
+
+
+# ✅ Shared by every request in this process
+revocations = RevocationList()
+
+
+def revoke_token(db: Session, claims: dict):
+    """Revokes one token inside the caller's transaction; raises IntegrityError if it already was."""
+    _record_revocation(db, claims["jti"], claims["uid"], datetime.utcnow(), datetime.utcfromtimestamp(claims["exp"]))
+
+
+def revoke_user_tokens(db: Session, user_id: int):
+    """Revokes every token issued to ``user_id`` so far, inside the caller's transaction."""
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=max(ACCESS_TOKEN_TTL_SECONDS, REFRESH_TOKEN_TTL_SECONDS))
+    _record_revocation(db, None, user_id, now, expires_at)
+
+
+def _record_revocation(db: Session, jti, user_id, revoked_at: datetime, expires_at: datetime):
+    db.execute(insert(TokenRevocation).values(jti=jti, user_id=user_id, revoked_at=revoked_at, expires_at=expires_at))
+    db.info.setdefault("revocations", []).append((jti, user_id, _epoch(revoked_at), _epoch(expires_at)))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_revocations(session):
+    for revocation in session.info.pop("revocations", ()):
+        revocations.add(*revocation)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_revocations(session):
+    session.info.pop("revocations", None)
+
+
+# ---------------- VERIFYING ----------------
+# ✅ access token -> claims; decoding is ~100us, so repeat requests skip it (revocation is still checked every time)
+_verified = TTLCache(max_entries=USER_CACHE_MAX_ENTRIES, ttl=USER_CACHE_TTL_SECONDS)
+
+
+def decode_token(token: str, expected_type: str = ACCESS) -> dict:
+    """Checks signature, expiry, type and revocation, without touching the database (bar the periodic sync).
+
+    Raises jwt.ExpiredSignatureError for expired tokens, RevokedTokenError for
+    revoked ones and jwt.InvalidTokenError for anything else wrong.
+    """
+    if expected_type == ACCESS:
+        claims = _verified.get(token)
+        if claims is not None:
+            if revocations.is_revoked(claims):
+                raise RevokedTokenError("Token has been revoked")
+            return claims
+
+    kid = get_unverified_header(token).get("kid")
+    if kid is None:
+        # Issued before key ids existed: only "sub" inside, so the caller looks the user up
+        if expected_type != ACCESS:
+            raise InvalidTokenError("Not a refresh token")
+        return decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+    key = SIGNING_KEYS.get(kid)
+    if key is None:
+        raise InvalidTokenError("Unknown signing key")
+    claims = decode(token, key, algorithms=[ALGORITHM], options={"require": ["exp", "iat", "jti", "uid", "typ"]})
+    if claims["typ"] != expected_type:
+        raise InvalidTokenError("Wrong token type")
+    if revocations.is_revoked(claims):
+        raise RevokedTokenError("Token has been revoked")
+    if expected_type == ACCESS:
+        ttl = min(USER_CACHE_TTL_SECONDS, claims["exp"] - time.time())  # never outlives the token
+        if ttl > 0:
+            _verified.set(token, claims, ttl=ttl)
+    return claims